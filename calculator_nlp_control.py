@@ -2,7 +2,72 @@
 Direct Calculator Control using Natural Language
 Simpler interface that directly uses the calculator controller
 """
-from mcp_calculator_server import CalculatorController, CalculatorInstructionParser
+import asyncio
+import functools
+import os
+import sys
+import threading
+from typing import Any, Dict, List
+
+from calculator_parser import CalculatorInstructionParser
+from mcp_calculator_server import CalculatorController
+from parser_kernel import decode, encode, fixup, warm_up
+
+# Extra pacing between clicks (seconds); lower it for headless benchmarks
+CLICK_DELAY_S = 0.2
+# Status lines buffered per stdout write when not attached to a terminal
+STATUS_BATCH = 8
+
+
+def flush_status(lines: List[str]):
+    """Write buffered status lines in a single call"""
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+        lines.clear()
+
+
+def emit_status(lines: List[str], line: str):
+    """Queue a status line; written immediately on a terminal, else every STATUS_BATCH lines"""
+    lines.append(line)
+    if len(lines) >= STATUS_BATCH or sys.stdout.isatty():
+        flush_status(lines)
+
+
+def memoize_parse(parser: CalculatorInstructionParser, maxsize: int = 1024) -> CalculatorInstructionParser:
+    """Cache parser.parse per instruction string (disable with NLP_CACHE=0)"""
+    if os.environ.get("NLP_CACHE", "1") == "0":
+        return parser
+    
+    # Cache immutable tuples so callers can't mutate a shared cached result
+    parse = parser.parse
+    cached = functools.lru_cache(maxsize=maxsize)(lambda instruction: tuple(parse(instruction)))
+    parser.parse = lambda instruction: list(cached(instruction))
+    return parser
+
+
+async def run_clicks(calculator: CalculatorController, buttons: List[str],
+                     delay: float = CLICK_DELAY_S) -> List[Dict[str, Any]]:
+    """Dispatch clicks in order on a worker thread, pacing them by delay"""
+    # UI clicks must stay serial; the semaphore hands them out in FIFO order
+    gate = asyncio.Semaphore(1)
+    total = len(buttons)
+    lines: List[str] = []
+    
+    async def worker(i: int, button: str) -> Dict[str, Any]:
+        async with gate:
+            emit_status(lines, f"\n  {i}/{total}. Processing '{button}'...")
+            result = await asyncio.to_thread(calculator.click_button, button)
+            if result.get("success"):
+                emit_status(lines, f"     ✅ Success")
+            else:
+                emit_status(lines, f"     ❌ Failed: {result.get('error')}")
+            await asyncio.sleep(delay)
+            return result
+    
+    results = await asyncio.gather(*(worker(i, b) for i, b in enumerate(buttons, 1)))
+    flush_status(lines)
+    return results
 
 
 def main():
@@ -12,11 +77,16 @@ def main():
     
     # Initialize controller and parser
     calculator = CalculatorController()
-    parser = CalculatorInstructionParser()
+    parser = memoize_parse(CalculatorInstructionParser())
+    
+    # Compile the fixup kernel in the background while the calculator opens
+    warm = threading.Thread(target=warm_up, daemon=True)
+    warm.start()
     
     # Open calculator
     print("\n🚀 Opening Calculator...")
     result = calculator.open_calculator()
+    warm.join()
     if not result.get("success"):
         print(f"❌ Failed to open calculator: {result.get('error')}")
         return
@@ -29,38 +99,32 @@ def main():
     
     # Parse instruction
     buttons = parser.parse(instruction)
-    print(f"🔢 Parsed button sequence: {' → '.join(buttons)}")
     
     # Safety check: Ensure "=" is clicked before square/root operations
     # This ensures we get the result first
-    if "square" in buttons or "√" in buttons:
-        # Find the index of square/root
-        square_idx = None
-        for i, btn in enumerate(buttons):
-            if btn in ["square", "√"]:
-                square_idx = i
-                break
-        
-        if square_idx is not None and square_idx > 0:
-            # Check if "=" is before square/root
-            if buttons[square_idx - 1] != "=":
-                # Check if there's an operation before square
-                has_operation = any(op in buttons[:square_idx] for op in ["+", "-", "×", "÷"])
-                if has_operation:
-                    print(f"⚠️  Adding '=' before square operation to get result first")
-                    buttons.insert(square_idx, "=")
-                    print(f"🔢 Updated sequence: {' → '.join(buttons)}")
+    codes = encode(buttons)
+    fixed = fixup(codes)
+    needs_eq = fixed.shape[0] != codes.shape[0]
+    if needs_eq:
+        print(f"⚠️  Adding '=' before square operation to get result first")
+        buttons = decode(fixed)
+    
+    formatted = " → ".join(buttons)
+    print(f"🔢 Parsed button sequence: {'(updated) ' if needs_eq else ''}{formatted}")
     
     # Execute sequence
     print("\n🖱️ Executing clicks...")
-    print("⏱️  Note: 4 second pause between clicks for visibility")
-    for i, button in enumerate(buttons, 1):
-        print(f"\n  {i}/{len(buttons)}. Processing '{button}'...")
-        result = calculator.click_button(button)
-        if result.get("success"):
-            print(f"     ✅ Success")
-        else:
-            print(f"     ❌ Failed: {result.get('error')}")
+    try:
+        run = calculator.compile_sequence(buttons, delay=CLICK_DELAY_S)
+    except (RuntimeError, ValueError) as e:
+        print(f"⚠️  Falling back to per-button clicks: {e}")
+        print("⏱️  Note: 4 second pause between clicks for visibility")
+        asyncio.run(run_clicks(calculator, buttons))
+    else:
+        flush_status([
+            f"  {i}/{len(buttons)}. '{button}': {'✅ Success' if success else '❌ Failed'}"
+            for i, (button, success) in enumerate(zip(buttons, run()), 1)
+        ])
     
     print("\n✅ Calculation complete!")
     print("👀 Check the calculator window to see the result")
@@ -0,0 +1,153 @@
+"""
+Natural language instruction parser for the calculator
+Kept free of GUI imports so it can be used (and tested) without a display
+"""
+import re
+from typing import List
+
+import numpy as np
+
+from parser_kernel import encode_batch, fixup_batch
+
+
+class CalculatorInstructionParser:
+    """Parses natural language calculator instructions"""
+    
+    # Compiled once at import; shared by every parser instance
+    # One alternation replaces every number word in a single scan
+    _NUMBER_WORD_RE = re.compile(r'\b(zero|one|two|three|four|five|six|seven|eight|nine)\b')
+    # Digit runs, operation keywords and square/root markers, collected in one scan per
+    # operation. Markers match anywhere (like the old substring checks, so "squared" still
+    # counts); "square root" is listed first so the pair is recognised as one token.
+    _TOKENS_RE = re.compile(
+        r'(\d+)|\b(and|add|added|adding|addition|plus'
+        r'|subtract|subtracted|subtracting|subtraction|minus'
+        r'|multiply|multiplied|multiplication|times|by|divide|divided)\b'
+        r'|(square root|square|sqrt|root|√)'
+    )
+    _SQUARE_HITS = frozenset(("square root", "square"))
+    _ROOT_HITS = frozenset(("square root", "root"))
+    _SQRT_HITS = frozenset(("square root", "sqrt", "√"))
+    # Splits chained operations ("... then ...")
+    _THEN_RE = re.compile(r'\bthen\b')
+    
+    def __init__(self):
+        self.number_map = {
+            "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
+            "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9"
+        }
+        self.operation_map = {
+            "add": "+", "plus": "+", "addition": "+",
+            "subtract": "-", "minus": "-", "subtraction": "-",
+            "multiply": "×", "times": "×", "multiplication": "×",
+            "divide": "÷", "division": "÷",
+            "equals": "=", "equal": "=",
+            "square": "square", "squared": "square",
+            "square root": "√", "sqrt": "√"
+        }
+        self._ops = frozenset(("+", "-", "×", "÷"))
+        # Operation keywords (with inflections), checked in this priority order
+        self._add_kw = frozenset(("add", "added", "adding", "addition", "plus"))
+        self._sub_kw = frozenset(("subtract", "subtracted", "subtracting", "subtraction", "minus"))
+        self._mul_kw = frozenset(("multiply", "multiplied", "multiplication", "times", "by"))
+        self._div_kw = frozenset(("divide", "divided"))
+    
+    def parse(self, instruction: str) -> List[str]:
+        """Parse natural language instruction into sequence of button clicks"""
+        instruction = instruction.lower().strip()
+        buttons = []
+        
+        # Replace word numbers with digits
+        instruction = self._NUMBER_WORD_RE.sub(lambda m: self.number_map[m.group(1)], instruction)
+        
+        # Each "then" segment is parsed the same way and operates on the running result;
+        # a segment that applies an operator is closed with "=" before the next one
+        for segment in self._THEN_RE.split(instruction):
+            segment_buttons = self._parse_single_operation(segment.strip())
+            if segment_buttons and segment_buttons[-1] != "=":
+                if not self._ops.isdisjoint(segment_buttons):
+                    segment_buttons.append("=")
+            buttons.extend(segment_buttons)
+        
+        return buttons
+    
+    def parse_batch(self, instructions: List[str]) -> np.ndarray:
+        """Parse many instructions into an (N, max_len) int8 opcode matrix
+        
+        Rows are padded with parser_kernel.PAD_CODE and have the "=" before square/root
+        fixup applied in one vectorized sweep. Eval/training batches repeat instructions
+        heavily, so each distinct instruction is parsed and encoded once and the rows are
+        fanned back out with a single gather.
+        """
+        rows = {}
+        inverse = np.fromiter((rows.setdefault(instruction, len(rows)) for instruction in instructions),
+                              dtype=np.intp, count=len(instructions))
+        codes = fixup_batch(encode_batch([self.parse(instruction) for instruction in rows]))
+        return codes[inverse]
+    
+    def _scan(self, instruction: str) -> tuple:
+        """Single scan: numbers (including multi-digit), keyword hits and "and" separators
+        
+        Returns (numbers, number_segments, hits, and_count) where number_segments[i] is how
+        many "and"s precede numbers[i].
+        """
+        numbers = []
+        number_segments = []
+        hits = set()
+        and_count = 0
+        for match in self._TOKENS_RE.finditer(instruction):
+            digits, word, marker = match.groups()
+            if digits:
+                numbers.append(digits)
+                number_segments.append(and_count)
+            elif word == "and":
+                and_count += 1
+            else:
+                hits.add(word or marker)
+        return numbers, number_segments, hits, and_count
+    
+    def _parse_single_operation(self, instruction: str) -> List[str]:
+        """Parse a single operation (no 'then' clauses)"""
+        buttons = []
+        numbers, number_segments, keywords, and_count = self._scan(instruction)
+        
+        # Determine operation
+        operation = None
+        if not keywords.isdisjoint(self._add_kw):
+            operation = "+"
+        elif not keywords.isdisjoint(self._sub_kw):
+            operation = "-"
+        elif not keywords.isdisjoint(self._mul_kw):
+            # "multiply 5 by 7" or "5 times 7"
+            operation = "×"
+        elif not keywords.isdisjoint(self._div_kw):
+            operation = "÷"
+        
+        # Handle "and" keyword - typically means two operands
+        # "add 2 and 3" -> 2, +, 3
+        if and_count and operation:
+            # First number before the first "and", first number between the first and second "and"
+            left = next((n for n, seg in zip(numbers, number_segments) if seg == 0), None)
+            right = next((n for n, seg in zip(numbers, number_segments) if seg == 1), None)
+            
+            if left and right:
+                # Left digits, operation, right digits, equals - built in one list display
+                return [*left, operation, *right, "="]
+        
+        # Build button sequence (fallback to original logic)
+        if operation and len(numbers) >= 2:
+            # Digits and operators are all one-character buttons, so joining the numbers
+            # with the operator and splitting into characters gives every click at once
+            buttons = [*operation.join(numbers), "="]
+        elif len(numbers) == 1:
+            # Single number - click each digit
+            buttons = list(numbers[0])
+        
+        # Square / square root of a single number, or with no number of the current result
+        if len(numbers) <= 1:
+            if not keywords.isdisjoint(self._SQUARE_HITS) and keywords.isdisjoint(self._ROOT_HITS):
+                buttons.append("square")
+            elif not keywords.isdisjoint(self._SQRT_HITS):
+                buttons.append("√")
+        
+        return buttons
@@ -3,49 +3,240 @@ MCP Client for Calculator Control
 Example client that uses the calculator MCP server
 """
 import json
+import queue
+import socket
 import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import msgspec
+except ImportError:
+    # msgspec is optional - fall back to the stdlib json codec
+    msgspec = None
+
+RECV_BUFFER_SIZE = 64 * 1024
+# Seconds to wait for a reply before giving up on a request
+DEFAULT_TIMEOUT = 30.0
+# Shared default params; never mutated, only serialized
+_EMPTY_PARAMS: dict = {}
 
 
 class CalculatorMCPClient:
     """Client for interacting with Calculator MCP Server"""
     
-    def __init__(self, server_script: str = "mcp_calculator_server.py"):
+    def __init__(self, server_script: str = "mcp_calculator_server.py", socket_path: Optional[str] = None,
+                 timeout: float = DEFAULT_TIMEOUT):
         self.server_script = server_script
+        # Connect to a running `--unix` server instead of spawning one over stdio
+        self.socket_path = socket_path
+        self.timeout = timeout
         self.request_id = 1
+        self._proc: Optional[subprocess.Popen] = None
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._writer = None
+        # Request envelope reused for every call; only id/method/params change
+        self._req = {"jsonrpc": "2.0", "id": 0, "method": "", "params": _EMPTY_PARAMS}
+        # Decoded replies handed over by the connection's reader thread
+        self._inbox: Optional[queue.Queue] = None
+        # Responses read off the pipe but not yet claimed, keyed by request id
+        self._pending: Dict[int, dict] = {}
+        if msgspec is not None:
+            self._encode = msgspec.json.Encoder().encode
+            self._decode = msgspec.json.Decoder().decode
+        else:
+            self._encode = lambda obj: json.dumps(obj, separators=(",", ":")).encode("utf-8")
+            self._decode = lambda buf: json.loads(bytes(buf))
+    
+    def _connect(self):
+        """Open the server connection once and reuse it for every request"""
+        if self.socket_path:
+            if self._sock is None:
+                self._pending.clear()
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._sock.connect(self.socket_path)
+                self._reader = self._sock.makefile("rb")
+                self._writer = self._sock.makefile("wb")
+                self._start_reader()
+        elif self._proc is None or self._proc.poll() is not None:
+            self._pending.clear()
+            # stderr is inherited so server errors show up in our console
+            self._proc = subprocess.Popen(
+                [sys.executable, self.server_script, "--content-length"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            self._reader = self._proc.stdout
+            self._writer = self._proc.stdin
+            self._start_reader()
+    
+    def _start_reader(self):
+        """Read replies on a background thread so _read_response can wait with a deadline
+        
+        Blocking pipe reads can't time out portably (select() doesn't work on Windows pipes).
+        """
+        self._inbox = queue.Queue()
+        threading.Thread(target=self._reader_loop, args=(self._reader, self._inbox), daemon=True).start()
+    
+    def _reader_loop(self, reader, inbox: queue.Queue):
+        """Decode every framed reply into inbox; None marks the end of the connection"""
+        # Reusable receive buffer, owned by this connection's thread; grown when a reply doesn't fit
+        recv_buf = [bytearray(RECV_BUFFER_SIZE)]
+        try:
+            while True:
+                body = self._read_message(reader, recv_buf)
+                if body is None:
+                    break
+                try:
+                    inbox.put(self._decode(body))
+                except ValueError as e:
+                    inbox.put(e)
+        except (OSError, ValueError):
+            pass  # Connection closed under us
+        inbox.put(None)
+    
+    @staticmethod
+    def _read_message(reader, recv_buf: List[bytearray]) -> Optional[memoryview]:
+        """Read one Content-Length framed message body, or None on EOF
+        
+        The returned view aliases recv_buf[0] and is only valid until the next read.
+        """
+        length = None
+        while True:
+            line = reader.readline()
+            if not line:
+                return None
+            if line.startswith(b"Content-Length:"):
+                length = int(line[15:])
+            elif length is not None and not line.strip():
+                break
+            # Anything else is server debug output printed outside a frame
+        
+        if length > len(recv_buf[0]):
+            recv_buf[0] = bytearray(length)
+        view = memoryview(recv_buf[0])[:length]
+        read = 0
+        while read < length:
+            n = reader.readinto(view[read:])
+            if not n:
+                return None
+            read += n
+        return view
+    
+    def _read_response(self, request_id: int) -> dict:
+        """Read responses from the server until the one for request_id arrives
+        
+        Raises TimeoutError (and drops the connection) if it doesn't arrive within self.timeout seconds.
+        """
+        deadline = time.monotonic() + self.timeout
+        while request_id not in self._pending:
+            try:
+                response = self._inbox.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                # The server is stuck or never answered; start over with a fresh connection next time
+                if self._proc is not None:
+                    self._proc.kill()
+                self.close()
+                raise TimeoutError(f"No response to request {request_id} within {self.timeout}s") from None
+            if response is None:
+                self._inbox.put(None)  # Keep reporting the closed connection to later reads
+                return {"error": {"message": "Server closed the connection"}}
+            if isinstance(response, ValueError):
+                return {"error": {"message": f"Failed to parse response: {response}"}}
+            # JSON-RPC batch replies arrive as one array of responses
+            for item in response if isinstance(response, list) else (response,):
+                if not isinstance(item, dict):
+                    continue
+                if item.get("id") is None:
+                    # No request waits on a null id (e.g. the server rejected a request it
+                    # couldn't read); report it rather than parking it in _pending forever
+                    if "error" in item:
+                        print(f"Server error without request id: {item['error']}", file=sys.stderr)
+                    continue
+                self._pending[item["id"]] = item
+        return self._pending.pop(request_id)
+    
+    def _encode_request(self, method: str, params: Optional[dict]) -> Tuple[int, bytes]:
+        """Serialize a request through the reused envelope; returns (id, encoded request)"""
+        request_id = self.request_id
+        self.request_id += 1
+        req = self._req
+        req["id"] = request_id
+        req["method"] = method
+        req["params"] = params or _EMPTY_PARAMS
+        return request_id, self._encode(req)
     
     def _send_request(self, method: str, params: dict = None) -> dict:
         """Send JSON-RPC request to MCP server"""
-        request = {
-            "jsonrpc": "2.0",
-            "id": self.request_id,
-            "method": method,
-            "params": params or {}
-        }
-        self.request_id += 1
+        request_id, line = self._encode_request(method, params)
+        
+        try:
+            self._connect()
+            self._writer.write(line + b"\n")
+            self._writer.flush()
+        except OSError as e:
+            return {"error": {"message": f"Failed to send request: {e}"}}
+        
+        return self._read_response(request_id)
+    
+    def send_batch(self, calls: List[Tuple[str, dict]]) -> List[dict]:
+        """Pipeline several JSON-RPC requests, then collect all responses in order"""
+        encoded = [self._encode_request(method, params) for method, params in calls]
+        
+        try:
+            self._connect()
+            self._writer.write(b"".join(line + b"\n" for _, line in encoded))
+            self._writer.flush()
+        except OSError as e:
+            return [{"error": {"message": f"Failed to send request: {e}"}} for _ in encoded]
         
-        # Start server process
-        process = subprocess.Popen(
-            [sys.executable, self.server_script],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        return [self._read_response(request_id) for request_id, _ in encoded]
+    
+    def batch(self, requests: List[Tuple[str, dict]]) -> List[dict]:
+        """Send requests as a single JSON-RPC 2.0 batch array; returns responses in request order"""
+        if not requests:
+            # An empty array is an invalid JSON-RPC batch; there is nothing to send
+            return []
         
-        # Send request
-        request_json = json.dumps(request) + "\n"
-        stdout, stderr = process.communicate(input=request_json, timeout=30)
+        encoded = [self._encode_request(method, params) for method, params in requests]
         
-        if stderr:
-            print(f"Server error: {stderr}", file=sys.stderr)
+        try:
+            self._connect()
+            self._writer.write(b"[" + b",".join(body for _, body in encoded) + b"]\n")
+            self._writer.flush()
+        except OSError as e:
+            return [{"error": {"message": f"Failed to send request: {e}"}} for _ in encoded]
         
+        return [self._read_response(request_id) for request_id, _ in encoded]
+    
+    def close(self):
+        """Close the socket connection or terminate the server process"""
+        self._pending.clear()
+        if self._sock is not None:
+            self._reader.close()
+            self._writer.close()
+            self._sock.close()
+            self._sock = None
+        if self._proc is None:
+            return
         try:
-            response = json.loads(stdout.strip())
-            return response
-        except json.JSONDecodeError as e:
-            return {"error": {"message": f"Failed to parse response: {e}", "stdout": stdout}}
+            self._proc.stdin.close()
+            self._proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self._proc.kill()
+            self._proc.wait()
+        finally:
+            self._proc = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def list_tools(self) -> dict:
         """List available tools"""
@@ -84,21 +275,26 @@ def main():
     print("🧮 Calculator MCP Client")
     print("=" * 50)
     
+    instruction = "Add 2 and 3 and then find the square of the result"
+    
+    # List tools, open calculator and execute the calculation in one JSON-RPC batch
+    tools_response, open_result, calc_result = client.batch([
+        ("tools/list", {}),
+        ("tools/call", {"name": "open_calculator", "arguments": {}}),
+        ("tools/call", {"name": "execute_calculation", "arguments": {"instruction": instruction}}),
+    ])
+    
     # List available tools
     print("\n📋 Available tools:")
-    tools_response = client.list_tools()
     if "tools" in tools_response:
-        for tool in tools_response["tools"]:
-            print(f"  - {tool['name']}: {tool['description']}")
+        sys.stdout.write("".join(f"  - {tool['name']}: {tool['description']}\n" for tool in tools_response["tools"]))
     
     # Example: Open calculator
     print("\n🚀 Opening Calculator...")
-    open_result = client.open_calculator()
     print(f"Result: {json.dumps(open_result, indent=2)}")
     
     # Example: Execute calculation
-    print("\n🧮 Executing: 'Add 2 and 3 and then find the square of the result'")
-    calc_result = client.execute_calculation("Add 2 and 3 and then find the square of the result")
+    print(f"\n🧮 Executing: '{instruction}'")
     
     if "content" in calc_result:
         for content in calc_result["content"]:
@@ -109,6 +305,7 @@ def main():
                 print(f"  Button Sequence: {' → '.join(result_data.get('button_sequence', []))}")
                 print(f"  Success: {result_data.get('success', False)}")
     
+    client.close()
     print("\n✅ Done!")
 
 
@@ -2,132 +2,356 @@
 MCP Server for Calculator Control
 Exposes tools to control Windows Calculator using natural language instructions
 """
+import functools
 import json
-import re
+import logging
+import pickle
 import time
+import socket
+import stat
 import subprocess
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Any, Callable, Dict, List, Optional
 import sys
 import os
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional - fall back to the stdlib json module
+    orjson = None
+
+# Compact separators for the stdlib fallback; orjson output is always compact
+_ENC_KW = {"separators": (",", ":")}
+
+if orjson is not None:
+    def _dumps(obj: Any) -> str:
+        """Compact JSON text for the content.text payloads"""
+        return orjson.dumps(obj).decode("utf-8")
+    
+    # Compact UTF-8 bytes for messages on the wire
+    _dumps_wire = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj: Any) -> str:
+        """Compact JSON text for the content.text payloads"""
+        return json.dumps(obj, **_ENC_KW)
+    
+    def _dumps_wire(obj: Any) -> bytes:
+        """Compact UTF-8 bytes for messages on the wire"""
+        return json.dumps(obj, **_ENC_KW).encode("utf-8")
+    
+    _loads = json.loads
+
+try:
+    import simdjson
+except ImportError:
+    # simdjson is optional - fdom.json is streamed with ijson or loaded with json instead
+    simdjson = None
+
+try:
+    import ijson
+except ImportError:
+    # ijson is optional - fall back to a full json.load of fdom.json
+    ijson = None
+
+logger = logging.getLogger("mcp_calc")
+
+# Shared fallback for missing nested dicts; never mutated
+_EMPTY_DICT: dict = {}
+# Window titles containing any of these belong to IDEs, never Calculator
+_EXCLUDE = ("cursor", "code", "visual studio", "pycharm", "intellij")
+
+
+def _window_title(window_info: Dict[str, Any]) -> str:
+    """Title from a SimpleWindowAPI window info dict ('' if missing)"""
+    return (window_info.get("window_data") or _EMPTY_DICT).get("title", "")
+
+
+def _match_any(patterns: tuple) -> Callable[[str, str], bool]:
+    """Match rule: any pattern appears in the icon name or brief"""
+    return lambda icon_name, brief: any(p in icon_name or p in brief for p in patterns)
+
+
+def _match_plus(icon_name: str, brief: str) -> bool:
+    """Match rule for "+": exact "+ Button" (not "M+ Button" or "+/- Button")"""
+    return icon_name == "+ button" or ("addition" in brief and "+" in icon_name
+                                       and not icon_name.startswith("m") and "+/-" not in icon_name)
+
+
+def _lazy_fdom_attr() -> functools.cached_property:
+    """Controller attribute that loads fdom.json (via _load_fdom) the first time it is read"""
+    def load(self):
+        self._load_fdom()
+        return self.__dict__[prop.attrname]
+    
+    prop = functools.cached_property(load)
+    return prop
+
+
 # Add utils to path
 project_root = Path(__file__).parent
 fdom_path = project_root / "utils" / "fdom"
 utils_path = project_root / "utils"
 
-if str(fdom_path) not in sys.path:
-    sys.path.insert(0, str(fdom_path))
-if str(utils_path) not in sys.path:
-    sys.path.insert(0, str(utils_path))
+_sys_paths = set(sys.path)
+for _path in (str(fdom_path), str(utils_path)):
+    if _path not in _sys_paths:
+        sys.path.insert(0, _path)
 
 # Import modules
 from app_controller import AppController
 from config_manager import ConfigManager
 from screen_manager import ScreenManager
 from gui_controller import SimpleWindowAPI
+from parser_kernel import PAD_CODE, decode
+from calculator_parser import CalculatorInstructionParser
 
 
 class CalculatorController:
     """Controls Windows Calculator using fdom.json"""
     
-    def __init__(self, fdom_path: str = "apps/calc/fdom.json"):
+    def __init__(self, fdom_path: str = "apps/calc/fdom.json", keyboard_fast_path: bool = False):
         self.fdom_path = Path(fdom_path)
-        self.fdom_data = None
+        # Type runs of digits in click_sequence instead of clicking each digit button
+        self.keyboard_fast_path = keyboard_fast_path
         self.app_controller = None
+        # Created on the first launch and reused if Calculator has to be relaunched
+        self._config = None
+        self._screen_manager = None
         self.gui_api = SimpleWindowAPI()
         self.window_id = None
         self.window_pos = None
         self.calculator_maximized = False  # Track if calculator is already maximized
-        self._load_fdom()
+        # Cached window position; refreshed when invalidated or older than WINDOW_POS_TTL_S
+        self._pos_valid: bool = False
+        self._last_focus_ts: float = 0.0
+        # When the open window was last confirmed (found, or clicked successfully)
+        self._last_verify: float = 0.0
+        # fdom.json itself is loaded on first use (see _lazy_fdom_attr)
         
+    # Seconds a cached window position is trusted before re-querying the GUI API
+    WINDOW_POS_TTL_S = 2.0
+    # Seconds open_calculator trusts the known window without re-enumerating windows
+    VERIFY_TTL_S = 5.0
+    # Settle delay between clicks in click_sequence
+    CLICK_SETTLE_S = 0.05
+    
+    # Button names pre-resolved into _name_index when fdom.json is loaded
+    _INDEXED_BUTTONS = ("+", "=", "-", "×", "*", "÷", "/", "square", "√") + tuple("0123456789")
+    # Spoken names indexed to the same node as their button (none of these match a node by scanning)
+    _BUTTON_SYNONYMS = {
+        "add": "+", "plus": "+", "addition": "+",
+        "subtract": "-", "minus": "-", "subtraction": "-",
+        "multiply": "×", "times": "×", "multiplication": "×",
+        "divide": "÷", "division": "÷",
+        "equals": "=", "equal": "=",
+        "squared": "square", "x²": "square",
+        "square root": "√", "sqrt": "√", "√x": "√",
+    }
+    # Direct mapping for common buttons (checked first for exact matches)
+    _BUTTON_MAPPINGS = {
+        "+": ("+ button", "addition"),
+        "=": ("= button", "equals"),
+        "-": ("- button", "minus", "subtract"),
+        "×": ("× button", "multiplication"),
+        "*": ("× button", "multiplication"),
+        "÷": ("÷ button", "division"),
+        "/": ("÷ button", "division"),
+        "square": ("x² button", "square"),
+        "√": ("√x button", "square root"),
+    }
+    # Primary match rule per mapped button: predicate on the lowercased (icon_name, brief)
+    _MATCH_RULES = {
+        name: _match_plus if name == "+" else _match_any(patterns)
+        for name, patterns in _BUTTON_MAPPINGS.items()
+    }
+    # Fallback validation (icon_name patterns, brief patterns); other names have no fallback
+    _FALLBACK_RULES = {
+        "+": (("+",), ("addition",)),
+        "=": (("=",), ("equals",)),
+        "square": (("square", "x²"), ()),
+    }
+    # Node fields kept from fdom.json; everything else is skipped at load
+    _NODE_FIELDS = ("bbox", "g_icon_name", "g_brief")
+    
+    # Built by _load_fdom on first access, so constructing a controller does no file I/O
+    _state_nodes = _lazy_fdom_attr()
+    _nodes_root = _lazy_fdom_attr()
+    _name_index = _lazy_fdom_attr()
+    _centers = _lazy_fdom_attr()
+    _centers_arr = _lazy_fdom_attr()
+    _id_to_idx = _lazy_fdom_attr()
+    # state id -> {node id: (icon_name, brief)} lowercased once; root at load, others on first scan
+    _nodes_lc = _lazy_fdom_attr()
+    
+    @classmethod
+    def _read_state_nodes(cls, path: Path) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Read the nodes of every state from fdom.json, keeping only _NODE_FIELDS
+        
+        Uses simdjson on-demand access or ijson streaming when available, so the edges,
+        navigation tree and unused node fields are never built as Python objects.
+        """
+        fields = cls._NODE_FIELDS
+        if simdjson is not None:
+            parser = simdjson.Parser()
+            with open(path, 'rb') as f:
+                states = parser.parse(f.read()).get("states") or {}
+            state_nodes = {}
+            for state_id in states.keys():
+                nodes = states[state_id].get("nodes") or {}
+                compact = {}
+                for node_id in nodes.keys():
+                    node = nodes[node_id]
+                    entry = {}
+                    for field in fields:
+                        value = node.get(field)
+                        if value is not None:
+                            entry[field] = value.as_list() if isinstance(value, simdjson.Array) else value
+                    compact[node_id] = entry
+                state_nodes[state_id] = compact
+            return state_nodes
+        
+        with open(path, 'rb') as f:
+            if ijson is not None:
+                states = dict(ijson.kvitems(f, "states", use_float=True))
+            else:
+                states = json.load(f).get("states", {})
+        return {
+            state_id: {
+                node_id: {field: node[field] for field in fields if node.get(field) is not None}
+                for node_id, node in state.get("nodes", {}).items()
+            }
+            for state_id, state in states.items()
+        }
+    
+    @classmethod
+    def _cached_state_nodes(cls, path: Path) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """_read_state_nodes through a pickle cache next to fdom.json, keyed on its mtime and size"""
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size, cls._NODE_FIELDS)
+        cache_path = path.with_suffix(".cache.pkl")
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_key, state_nodes = pickle.load(f)
+            if cached_key == key:
+                return state_nodes
+        except Exception:
+            pass  # Missing, stale or unreadable cache - rebuild it below
+        
+        state_nodes = cls._read_state_nodes(path)
+        tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((key, state_nodes), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.debug("Could not write fdom cache %s: %s", cache_path, e)
+        return state_nodes
+    
     def _load_fdom(self):
-        """Load fdom.json file"""
+        """Load the button nodes from fdom.json and index the common buttons"""
         try:
-            with open(self.fdom_path, 'r', encoding='utf-8') as f:
-                self.fdom_data = json.load(f)
-            print(f"✅ Loaded fdom.json with {len(self.fdom_data.get('states', {}).get('root', {}).get('nodes', {}))} nodes")
+            self._state_nodes = self._cached_state_nodes(self.fdom_path)
+            self._nodes_root = self._state_nodes.get("root", {})
+            self._nodes_lc = {"root": self._lowercase_nodes(self._nodes_root)}
+            logger.info("✅ Loaded fdom.json with %d nodes", len(self._nodes_root))
         except Exception as e:
-            print(f"❌ Error loading fdom.json: {e}")
+            logger.error("❌ Error loading fdom.json: %s", e)
             raise
+        
+        # Resolve each common button once so clicks are a dict lookup
+        # Keys and node ids are interned so index hits compare by identity
+        self._name_index: Dict[str, str] = {}
+        for name in self._INDEXED_BUTTONS:
+            node_id = self._scan_node_by_name(name, self._nodes_lc["root"])
+            if node_id:
+                self._name_index[sys.intern(name)] = sys.intern(node_id)
+        for synonym, name in self._BUTTON_SYNONYMS.items():
+            node_id = self._name_index.get(name)
+            if node_id:
+                self._name_index[sys.intern(synonym)] = node_id
+        
+        # Button centers in window coordinates, computed in one vectorized pass over an
+        # (N, 4) bbox array; nodes without a 4-value bbox are left out
+        valid = [(node_id, node_data["bbox"]) for node_id, node_data in self._nodes_root.items()
+                 if len(node_data.get("bbox", ())) == 4]
+        node_ids = [sys.intern(node_id) for node_id, _ in valid]
+        bboxes = np.array([bbox for _, bbox in valid], dtype=np.int32).reshape(-1, 4)
+        self._centers_arr = (bboxes[:, :2] + bboxes[:, 2:]) // 2
+        self._id_to_idx = {node_id: i for i, node_id in enumerate(node_ids)}
+        # Per-click lookups stay a dict hit that yields plain ints
+        self._centers: Dict[str, tuple] = dict(zip(node_ids, map(tuple, self._centers_arr.tolist())))
     
     def _find_node_by_name(self, name: str, state_id: str = "root") -> Optional[str]:
         """Find node ID by button name (e.g., '2', '+', '=')"""
-        state = self.fdom_data.get("states", {}).get(state_id, {})
-        nodes = state.get("nodes", {})
+        if state_id == "root":
+            nodes = self._nodes_root
+            node_id = self._name_index.get(sys.intern(name.lower().strip()))
+        else:
+            nodes = self._state_nodes.get(state_id, {})
+            node_id = None
+        
+        # Cold path: scan the nodes for names that aren't indexed
+        if node_id is None:
+            nodes_lc = self._nodes_lc.get(state_id)
+            if nodes_lc is None:
+                nodes_lc = self._nodes_lc[state_id] = self._lowercase_nodes(nodes)
+            node_id = self._scan_node_by_name(name, nodes_lc)
         
+        if node_id:
+            logger.debug("✅ Found %s → %s (%s)", name, node_id, nodes[node_id].get('g_icon_name', ''))
+            return node_id
+        
+        logger.warning("❌ Button '%s' not found in fdom.json", name)
+        # Debug: Show available buttons
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Available buttons:")
+            for node_id, node_data in list(nodes.items())[:10]:  # Show first 10
+                logger.debug("  %s: %s", node_id, node_data.get('g_icon_name', 'Unknown'))
+        return None
+    
+    @staticmethod
+    def _lowercase_nodes(nodes: Dict[str, Dict[str, Any]]) -> Dict[str, tuple]:
+        """Map node id -> (icon_name, brief), lowercased once for matching; icon names are interned"""
+        return {
+            node_id: (sys.intern(node_data.get("g_icon_name", "").lower()), node_data.get("g_brief", "").lower())
+            for node_id, node_data in nodes.items()
+        }
+    
+    @classmethod
+    def _scan_node_by_name(cls, name: str, nodes_lc: Dict[str, tuple]) -> Optional[str]:
+        """Scan nodes once for a button name, applying the matching rules in priority order"""
         # Normalize name for matching
         name_lower = name.lower().strip()
         name_original = name.strip()
         
-        # Direct mapping for common buttons (check these first for exact matches)
-        button_mappings = {
-            "+": ["+ button", "addition"],
-            "=": ["= button", "equals"],
-            "-": ["- button", "minus", "subtract"],
-            "×": ["× button", "multiplication"],
-            "*": ["× button", "multiplication"],
-            "÷": ["÷ button", "division"],
-            "/": ["÷ button", "division"],
-            "square": ["x² button", "square"],
-            "√": ["√x button", "square root"],
-        }
+        primary = cls._MATCH_RULES.get(name_lower)
+        if primary is None and name_lower.isdigit():
+            # Digit buttons
+            digit_label = f"{name_lower} button"
+            primary = lambda icon_name, brief: digit_label in icon_name
+        fallback = cls._FALLBACK_RULES.get(name_lower)
+        if primary is None and fallback is None:
+            return None
         
-        # First pass: Check for exact matches using button_mappings
-        if name_lower in button_mappings:
-            patterns = button_mappings[name_lower]
-            # For operators, prioritize exact matches
-            if name_lower == "+":
-                # Look for exact "+ Button" (not "M+ Button" or "+/- Button")
-                for node_id, node_data in nodes.items():
-                    icon_name = node_data.get("g_icon_name", "").lower()
-                    brief = node_data.get("g_brief", "").lower()
-                    # Check for exact "+ button" match - must start with "+" and not be "M+" or "+/-"
-                    if icon_name == "+ button" or ("addition" in brief and "+" in icon_name and not icon_name.startswith("m") and "+/-" not in icon_name):
-                        print(f"✅ Found {name} → {node_id} ({node_data.get('g_icon_name', '')})")
-                        return node_id
-            else:
-                # For other buttons, use pattern matching
-                for node_id, node_data in nodes.items():
-                    icon_name = node_data.get("g_icon_name", "").lower()
-                    brief = node_data.get("g_brief", "").lower()
-                    for pattern in patterns:
-                        if pattern in icon_name or pattern in brief:
-                            print(f"✅ Found {name} → {node_id} ({node_data.get('g_icon_name', '')})")
-                            return node_id
-        
-        # Second pass: Check for digit buttons
-        if name_lower.isdigit():
-            for node_id, node_data in nodes.items():
-                icon_name = node_data.get("g_icon_name", "").lower()
-                if f"{name_lower} button" in icon_name:
-                    print(f"✅ Found {name} → {node_id} ({node_data.get('g_icon_name', '')})")
-                    return node_id
-        
-        # Third pass: Fallback for other buttons
-        for node_id, node_data in nodes.items():
-            icon_name = node_data.get("g_icon_name", "").lower()
-            brief = node_data.get("g_brief", "").lower()
+        # First fallback match; only returned if no primary rule matches any node
+        fallback_id = None
+        
+        for node_id, (icon_name, brief) in nodes_lc.items():
+            if primary is not None and primary(icon_name, brief):
+                return node_id
             
-            # Check if name appears in icon_name or brief
-            if name_original in icon_name or name_lower in icon_name or name_lower in brief:
-                # Additional validation for operators
-                if name_lower == "+" and ("+" in icon_name or "addition" in brief):
-                    print(f"✅ Found {name} → {node_id} ({node_data.get('g_icon_name', '')})")
-                    return node_id
-                elif name_lower == "=" and ("=" in icon_name or "equals" in brief):
-                    print(f"✅ Found {name} → {node_id} ({node_data.get('g_icon_name', '')})")
-                    return node_id
-                elif name_lower == "square" and ("square" in icon_name or "x²" in icon_name):
-                    print(f"✅ Found {name} → {node_id} ({node_data.get('g_icon_name', '')})")
-                    return node_id
-        
-        print(f"❌ Button '{name}' not found in fdom.json")
-        # Debug: Show available buttons
-        print("Available buttons:")
-        for node_id, node_data in list(nodes.items())[:10]:  # Show first 10
-            print(f"  {node_id}: {node_data.get('g_icon_name', 'Unknown')}")
-        return None
+            # Fallback: name appears in icon_name or brief, and the node passes validation
+            if fallback is not None and fallback_id is None and (name_original in icon_name or name_lower in icon_name or name_lower in brief):
+                icon_patterns, brief_patterns = fallback
+                if any(p in icon_name for p in icon_patterns) or any(p in brief for p in brief_patterns):
+                    fallback_id = node_id
+        
+        return fallback_id
     
     def _find_calculator_window(self) -> Optional[str]:
         """Find Calculator window with more specific matching"""
@@ -135,86 +359,85 @@ class CalculatorController:
         windows = self.gui_api.get_windows()
         
         # Look for Calculator window specifically
-        calculator_patterns = ["calculator", "calc"]
-        
         for window_id, window_info in windows.items():
-            title = window_info.get('window_data', {}).get('title', '').lower()
+            title = _window_title(window_info)
+            title_lc = title.lower()
             # Exclude Cursor and other IDEs
-            if any(exclude in title for exclude in ["cursor", "code", "visual studio", "pycharm", "intellij"]):
+            if any(exclude in title_lc for exclude in _EXCLUDE):
                 continue
             
-            # Check if it matches calculator patterns
-            for pattern in calculator_patterns:
-                if pattern in title:
-                    # Verify it's actually Calculator by checking if title is exactly "Calculator" or starts with it
-                    if title == "calculator" or title.startswith("calculator"):
-                        print(f"✅ Found Calculator window: {window_id} - '{window_info.get('window_data', {}).get('title', '')}'")
-                        return window_id
+            # Verify it's actually Calculator: title is "Calculator" or starts with it
+            if title_lc.startswith("calculator"):
+                logger.debug("✅ Found Calculator window: %s - '%s'", window_id, title)
+                if window_id != self.window_id:
+                    # Handle changed - cached position belongs to the old window
+                    self.invalidate_window_pos()
+                return window_id
         
         return None
     
     def open_calculator(self) -> Dict[str, Any]:
         """Open Windows Calculator"""
+        # Fast path: window recently confirmed, skip the window enumeration
+        if self.window_id and self.window_pos and time.monotonic() - self._last_verify < self.VERIFY_TTL_S:
+            return {"success": True, "message": "Calculator already open (cached)", "window_id": self.window_id}
+        
         try:
             # Check if calculator is already open - use more specific search
             window_id = self._find_calculator_window()
             if window_id:
-                print("✅ Calculator already open")
+                logger.info("✅ Calculator already open")
                 self.window_id = window_id
+                self._last_verify = time.monotonic()
                 
                 # Maximize once if not already maximized
                 if not self.calculator_maximized:
-                    print("📐 Maximizing Calculator window (one time only)...")
+                    logger.info("📐 Maximizing Calculator window (one time only)...")
                     self.gui_api.maximize_window(self.window_id)
-                    time.sleep(1.0)  # Wait for maximize to complete
+                    # Wait for maximize to complete
+                    self._wait_until(lambda: self.gui_api.get_window_state(self.window_id) == "maximized", timeout=1.0)
                     self.calculator_maximized = True
                 else:
                     # Just simple focus, no minimize/maximize
                     self._simple_focus_window(self.window_id)
-                    time.sleep(0.2)
+                    self._wait_until(lambda: self._is_focused(self.window_id), timeout=0.2)
                 
+                self.invalidate_window_pos()
                 self._update_window_position()
                 return {"success": True, "message": "Calculator already open", "window_id": window_id}
             
             # Launch calculator
-            print("🚀 Launching Calculator...")
-            config = ConfigManager()
-            screen_manager = ScreenManager(config)
-            
-            # Use calc.exe (Windows built-in)
-            self.app_controller = AppController(
-                app_path="calc.exe",
-                target_screen=1,
-                config=config
-            )
-            self.app_controller.screen_manager = screen_manager
-            
-            result = self.app_controller.launch_app()
+            logger.info("🚀 Launching Calculator...")
+            result = self._ensure_app().launch_app()
             
             if result.get("success"):
                 self.window_id = result["app_info"]["window_id"]
-                time.sleep(2)  # Wait for window to stabilize
                 
-                # Re-find window to ensure we have the correct one
-                window_id = self._find_calculator_window()
-                if window_id:
-                    self.window_id = window_id
+                # Trust the launched window once its handle shows up as Calculator; refresh the
+                # window list at most once, and only enumerate for Calculator if that fails too
+                title = self._wait_until(lambda: self._calculator_title(self.window_id), timeout=1.0, interval=0.1)
+                if not title:
+                    self.gui_api.refresh()
+                    title = self._calculator_title(self.window_id)
+                if not title:
+                    window_id = self._find_calculator_window()
+                    if window_id:
+                        self.window_id = window_id
+                        title = self._calculator_title(window_id)
+                if title:
+                    logger.info("✅ Calculator window confirmed: '%s'", title)
+                    self._last_verify = time.monotonic()
                 
                 # Maximize once (AppController already maximizes, but mark as done)
                 self.calculator_maximized = True
-                print("✅ Calculator maximized (one time)")
+                logger.info("✅ Calculator maximized (one time)")
                 
                 # Simple focus (no minimize/maximize)
                 self._simple_focus_window(self.window_id)
-                time.sleep(0.3)
+                self._wait_until(lambda: self._is_focused(self.window_id), timeout=0.3)
+                self.invalidate_window_pos()
                 self._update_window_position()
                 
-                # Verify we have the right window
-                window_info = self.gui_api.get_window_info(self.window_id)
-                if window_info:
-                    title = window_info.get('window_data', {}).get('title', '')
-                    print(f"✅ Calculator window confirmed: '{title}'")
-                
                 return {"success": True, "message": "Calculator opened", "window_id": self.window_id}
             else:
                 return {"success": False, "error": result.get("error", "Unknown error")}
@@ -222,6 +445,22 @@ class CalculatorController:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def _ensure_app(self) -> AppController:
+        """Create the config, screen manager and app controller once; relaunches reuse them"""
+        if self._config is None:
+            self._config = ConfigManager()
+            self._screen_manager = ScreenManager(self._config)
+        
+        # Use calc.exe (Windows built-in)
+        if self.app_controller is None:
+            self.app_controller = AppController(
+                app_path="calc.exe",
+                target_screen=1,
+                config=self._config
+            )
+            self.app_controller.screen_manager = self._screen_manager
+        return self.app_controller
+    
     def _simple_focus_window(self, window_id: str) -> bool:
         """Simple focus without minimize/maximize - just bring to foreground"""
         try:
@@ -252,23 +491,77 @@ class CalculatorController:
                 current_state = self.gui_api.get_window_state(window_id)
                 if current_state == "minimized":
                     win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-                    time.sleep(0.2)
+                    self._wait_until(lambda: self.gui_api.get_window_state(window_id) != "minimized", timeout=0.2)
                 
                 # Bring to foreground
                 win32gui.SetForegroundWindow(hwnd)
-                time.sleep(0.1)
+                self._wait_until(lambda: win32gui.GetForegroundWindow() == hwnd, timeout=0.1)
                 return True
             except Exception as e:
-                print(f"⚠️ Simple focus failed: {e}, trying fallback")
+                logger.warning("⚠️ Simple focus failed: %s, trying fallback", e)
                 # Fallback: use the smart_foreground only if simple fails
                 return self.gui_api.focus_window(window_id)
         except Exception as e:
-            print(f"⚠️ Error in simple focus: {e}")
+            logger.warning("⚠️ Error in simple focus: %s", e)
+            return False
+    
+    @staticmethod
+    def _wait_until(pred: Callable[[], Any], timeout: float = 1.0, interval: float = 0.02) -> Any:
+        """Poll pred until it returns a truthy value (returned) or timeout seconds pass (returns None)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            result = pred()
+            if result:
+                return result
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+    
+    def _calculator_title(self, window_id: str) -> Optional[str]:
+        """Return window_id's title if it is a Calculator window, reading the handle directly
+        
+        Uses the cached window list (no re-enumeration); with win32gui the title is read live
+        from the window handle, so a window that just got its title is still recognized.
+        """
+        window_info = self.gui_api.get_window_info(window_id)
+        if not window_info:
+            return None
+        title = _window_title(window_info)
+        try:
+            import win32gui
+        except ImportError:
+            pass
+        else:
+            hwnd = window_info['window_data']['hwnd']
+            if not win32gui.IsWindow(hwnd):
+                return None
+            title = win32gui.GetWindowText(hwnd)
+        return title if title.lower().startswith("calculator") else None
+    
+    def _is_focused(self, window_id: str) -> bool:
+        """Check that window_id is the foreground window (without win32gui: that it's still Calculator)"""
+        window_info = self.gui_api.get_window_info(window_id)
+        if not window_info:
             return False
+        try:
+            import win32gui
+        except ImportError:
+            return "calculator" in _window_title(window_info).lower()
+        return win32gui.GetForegroundWindow() == window_info['window_data']['hwnd']
+    
+    def invalidate_window_pos(self):
+        """Force the next _update_window_position to re-query the window"""
+        self._pos_valid = False
     
     def _update_window_position(self):
-        """Update window position for click calculations"""
+        """Update window position for click calculations
+        
+        Returns early while the cached position is valid and younger than WINDOW_POS_TTL_S.
+        """
         if not self.window_id:
+            self._pos_valid = False
+            return
+        if self._pos_valid and self.window_pos and time.monotonic() - self._last_focus_ts <= self.WINDOW_POS_TTL_S:
             return
         
         # Refresh window list to get latest positions
@@ -278,18 +571,21 @@ class CalculatorController:
         if window_info:
             pos = window_info['window_data']['position']
             self.window_pos = {'left': pos['x'], 'top': pos['y']}
-            title = window_info.get('window_data', {}).get('title', '')
-            print(f"📍 Window position updated: '{title}' at ({pos['x']}, {pos['y']})")
+            self._pos_valid = True
+            self._last_focus_ts = time.monotonic()
+            title = _window_title(window_info)
+            logger.debug("📍 Window position updated: '%s' at (%s, %s)", title, pos['x'], pos['y'])
         else:
             # Fallback: try to find window again with specific search
-            print("⚠️ Window info not found, re-searching for Calculator...")
+            logger.warning("⚠️ Window info not found, re-searching for Calculator...")
+            self._pos_valid = False
             self.window_id = self._find_calculator_window()
             if self.window_id:
                 self._simple_focus_window(self.window_id)
-                time.sleep(0.3)
+                self._wait_until(lambda: self._is_focused(self.window_id), timeout=0.3)
                 self._update_window_position()
             else:
-                print("❌ Could not find Calculator window")
+                logger.error("❌ Could not find Calculator window")
     
     def click_button(self, button_name: str) -> Dict[str, Any]:
         """Click a calculator button by name"""
@@ -300,214 +596,269 @@ class CalculatorController:
                     return result
             
             # Find node ID for the button
-            print(f"🔍 Looking for button: '{button_name}'")
+            logger.debug("🔍 Looking for button: '%s'", button_name)
             node_id = self._find_node_by_name(button_name)
             if not node_id:
                 return {"success": False, "error": f"Button '{button_name}' not found in fdom.json"}
             
-            # Get node data from fdom
-            state = self.fdom_data.get("states", {}).get("root", {})
-            node_data = state.get("nodes", {}).get(node_id)
-            
-            if not node_data:
-                return {"success": False, "error": f"Node data not found for {node_id}"}
+            center = self._centers.get(node_id)
+            if center is None:
+                return {"success": False, "error": f"Invalid bbox for {node_id}"}
+            center_x, center_y = center
             
-            # Update window position
+            # Update window position (no-op while the cached one is fresh)
             self._update_window_position()
             if not self.window_pos:
                 return {"success": False, "error": "Could not get window position"}
             
             # Calculate absolute coordinates
-            bbox = node_data.get("bbox", [])
-            if len(bbox) != 4:
-                return {"success": False, "error": f"Invalid bbox for {node_id}"}
-            
-            x1, y1, x2, y2 = bbox
-            center_x = (x1 + x2) // 2
-            center_y = (y1 + y2) // 2
-            
             abs_x = self.window_pos['left'] + center_x
             abs_y = self.window_pos['top'] + center_y
             
             # CRITICAL: Ensure Calculator window is focused before clicking
             # Use simple focus (no minimize/maximize) since we already maximized once
-            print(f"🎯 Focusing Calculator window: {self.window_id} (simple focus, no minimize/maximize)")
-            self._simple_focus_window(self.window_id)
-            time.sleep(0.2)  # Brief pause for focus
+            logger.debug("🎯 Focusing Calculator window: %s (simple focus, no minimize/maximize)", self.window_id)
+            if not self._simple_focus_window(self.window_id):
+                # Focus lost - re-query the window position on the next click
+                self.invalidate_window_pos()
+            else:
+                self._last_focus_ts = time.monotonic()
+            self._wait_until(lambda: self._is_focused(self.window_id), timeout=0.2)  # Brief pause for focus
             
             # Verify window is still correct
             window_info = self.gui_api.get_window_info(self.window_id)
             if window_info:
-                title = window_info.get('window_data', {}).get('title', '')
+                title = _window_title(window_info)
                 if 'calculator' not in title.lower() or 'cursor' in title.lower():
-                    print(f"⚠️ Warning: Window title is '{title}', might not be Calculator!")
+                    logger.warning("⚠️ Warning: Window title is '%s', might not be Calculator!", title)
                     # Try to re-find Calculator window
                     calc_window = self._find_calculator_window()
                     if calc_window and calc_window != self.window_id:
-                        print(f"🔄 Switching to correct Calculator window: {calc_window}")
+                        logger.info("🔄 Switching to correct Calculator window: %s", calc_window)
                         self.window_id = calc_window
+                        self.invalidate_window_pos()
                         self.gui_api.focus_window(self.window_id)
-                        time.sleep(0.5)
+                        self._wait_until(lambda: self._is_focused(self.window_id), timeout=0.5)
                         self._update_window_position()
                         # Recalculate coordinates with new window position
                         abs_x = self.window_pos['left'] + center_x
                         abs_y = self.window_pos['top'] + center_y
             
             # Move mouse to position first (visible movement)
-            print(f"🖱️ Moving mouse to {button_name} ({node_id}) at ({abs_x}, {abs_y})")
-            print(f"   Window: {self.window_id}, Window pos: {self.window_pos}")
+            logger.debug("🖱️ Moving mouse to %s (%s) at (%s, %s)", button_name, node_id, abs_x, abs_y)
+            logger.debug("   Window: %s, Window pos: %s", self.window_id, self.window_pos)
             self.gui_api.set_cursor_position(abs_x, abs_y)
             time.sleep(1.0)  # Pause to show mouse movement
             
             # Click the button
-            print(f"🖱️ Clicking {button_name}...")
+            logger.debug("🖱️ Clicking %s...", button_name)
             success = self.gui_api.click(abs_x, abs_y)
             
             if success:
-                print(f"✅ Clicked {button_name}, waiting 3 seconds before next action...")
+                logger.debug("✅ Clicked %s, waiting 3 seconds before next action...", button_name)
+                self._last_verify = time.monotonic()
                 time.sleep(4.0)  # 4 second pause between clicks for visibility
                 return {"success": True, "message": f"Clicked {button_name}", "node_id": node_id}
             else:
+                self.invalidate_window_pos()
+                self._last_verify = 0.0
                 return {"success": False, "error": f"Failed to click {button_name}"}
                 
         except Exception as e:
+            self.invalidate_window_pos()
+            self._last_verify = 0.0
             return {"success": False, "error": str(e)}
-
-
-class CalculatorInstructionParser:
-    """Parses natural language calculator instructions"""
-    
-    def __init__(self):
-        self.number_map = {
-            "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4",
-            "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9"
-        }
-        self.operation_map = {
-            "add": "+", "plus": "+", "addition": "+",
-            "subtract": "-", "minus": "-", "subtraction": "-",
-            "multiply": "×", "times": "×", "multiplication": "×",
-            "divide": "÷", "division": "÷",
-            "equals": "=", "equal": "=",
-            "square": "square", "squared": "square",
-            "square root": "√", "sqrt": "√"
-        }
     
-    def parse(self, instruction: str) -> List[str]:
-        """Parse natural language instruction into sequence of button clicks"""
-        instruction = instruction.lower().strip()
-        buttons = []
+    def click_sequence(self, names: List[str]) -> List[Dict[str, Any]]:
+        """Click a sequence of buttons with one focus and a short settle delay between clicks
         
-        # Replace word numbers with digits
-        for word, digit in self.number_map.items():
-            instruction = re.sub(rf'\b{word}\b', digit, instruction)
+        Returns one click_button-style result per name. The window is only re-verified
+        when a click fails. With keyboard_fast_path, runs of digits are typed instead.
+        """
+        if not self.window_id:
+            result = self.open_calculator()
+            if not result.get("success"):
+                return [result for _ in names]
         
-        # Handle "then" clauses - split into parts
-        if "then" in instruction:
-            parts = instruction.split("then")
-            first_part = parts[0].strip()
-            second_part = " then ".join(parts[1:]).strip()
-            
-            # Parse first part recursively
-            first_buttons = self._parse_single_operation(first_part)
-            
-            # IMPORTANT: Ensure first part ends with "=" if it's an operation
-            # This ensures we get the result before applying the second operation
-            if first_buttons and first_buttons[-1] != "=":
-                # Check if first part contains an operation (not just a number)
-                if any(op in first_buttons for op in ["+", "-", "×", "÷"]):
-                    first_buttons.append("=")
-            
-            buttons.extend(first_buttons)
+        # Resolve every button up front so a bad name fails before anything is clicked
+        resolved = []
+        for name in names:
+            node_id = self._find_node_by_name(name)
+            if not node_id:
+                return [{"success": False, "error": f"Button '{name}' not found in fdom.json"} for _ in names]
+            center = self._centers.get(node_id)
+            if center is None:
+                return [{"success": False, "error": f"Invalid bbox for {node_id}"} for _ in names]
+            resolved.append((name, node_id) + center)
+        
+        self._update_window_position()
+        if not self.window_pos:
+            return [{"success": False, "error": "Could not get window position"} for _ in names]
+        
+        logger.debug("🎯 Focusing Calculator window: %s", self.window_id)
+        self.gui_api.focus_window(self.window_id)
+        self._last_focus_ts = time.monotonic()
+        
+        results = []
+        typing = self.keyboard_fast_path
+        i = 0
+        while i < len(resolved):
+            if typing and resolved[i][0].isdigit():
+                # Enter the whole run of digits with one keyboard call
+                j = i
+                while j < len(resolved) and resolved[j][0].isdigit():
+                    j += 1
+                run = resolved[i:j]
+                if self._type_digits("".join(name for name, _, _, _ in run)):
+                    results.extend({"success": True, "message": f"Typed {name}", "node_id": node_id}
+                                   for name, node_id, _, _ in run)
+                    self._last_verify = time.monotonic()
+                    time.sleep(self.CLICK_SETTLE_S)
+                    i = j
+                    continue
+                # Keyboard input unavailable - click digits for the rest of the sequence
+                typing = False
             
-            # Parse second part (operates on result)
-            if "square" in second_part and "root" not in second_part:
-                buttons.append("square")
-            elif "square root" in second_part or "sqrt" in second_part or "√" in second_part:
-                buttons.append("√")
-            elif "find" in second_part and "square" in second_part:
-                # "find the square of the result"
-                buttons.append("square")
-            else:
-                # Try to parse as another operation
-                second_buttons = self._parse_single_operation(second_part)
-                buttons.extend(second_buttons)
-        else:
-            # Single operation
-            buttons = self._parse_single_operation(instruction)
-            # Ensure single operations also end with "=" if they contain an operator
-            if buttons and buttons[-1] != "=":
-                if any(op in buttons for op in ["+", "-", "×", "÷"]):
-                    buttons.append("=")
-        
-        return buttons
-    
-    def _parse_single_operation(self, instruction: str) -> List[str]:
-        """Parse a single operation (no 'then' clauses)"""
-        buttons = []
-        
-        # Find all numbers (including multi-digit)
-        numbers = re.findall(r'\d+', instruction)
-        
-        # Determine operation
-        operation = None
-        if "add" in instruction or "plus" in instruction:
-            operation = "+"
-        elif "subtract" in instruction or "minus" in instruction:
-            operation = "-"
-        elif "multiply" in instruction or "times" in instruction or "by" in instruction:
-            # "multiply 5 by 7" or "5 times 7"
-            operation = "×"
-        elif "divide" in instruction:
-            operation = "÷"
-        
-        # Handle "and" keyword - typically means two operands
-        # "add 2 and 3" -> 2, +, 3
-        if "and" in instruction and operation:
-            # Split by "and" to get operands
-            parts = re.split(r'\band\b', instruction)
-            if len(parts) >= 2:
-                # Extract numbers from each part
-                left_numbers = re.findall(r'\d+', parts[0])
-                right_numbers = re.findall(r'\d+', parts[1])
-                
-                if left_numbers and right_numbers:
-                    # Click left number
-                    for digit in left_numbers[0]:
-                        buttons.append(digit)
-                    # Add operation
-                    buttons.append(operation)
-                    # Click right number
-                    for digit in right_numbers[0]:
-                        buttons.append(digit)
-                    # Add equals
-                    buttons.append("=")
-                    return buttons
-        
-        # Build button sequence (fallback to original logic)
-        if operation and len(numbers) >= 2:
-            # For multi-digit numbers, click each digit
-            for i, num_str in enumerate(numbers):
-                for digit in num_str:
-                    buttons.append(digit)
-                if i < len(numbers) - 1:  # Add operation between numbers
-                    buttons.append(operation)
-            buttons.append("=")  # Add equals at the end
-        elif len(numbers) == 1:
-            # Single number - click each digit
-            for digit in numbers[0]:
-                buttons.append(digit)
-            # Check if there's an operation on this single number
-            if "square" in instruction and "root" not in instruction:
-                buttons.append("square")
-            elif "square root" in instruction or "sqrt" in instruction:
-                buttons.append("√")
-        elif not numbers and "square" in instruction:
-            # Just square operation (on existing result)
-            buttons.append("square")
-        elif not numbers and ("square root" in instruction or "sqrt" in instruction):
-            buttons.append("√")
-        
-        return buttons
+            results.append(self._click_resolved(*resolved[i]))
+            time.sleep(self.CLICK_SETTLE_S)
+            i += 1
+        
+        return results
+    
+    def _type_digits(self, digits: str) -> bool:
+        """Type a run of digits into the focused Calculator; False if keyboard input isn't available"""
+        type_text = getattr(self.gui_api, "type_text", None)
+        if type_text is None:
+            return False
+        try:
+            success = bool(type_text(digits))
+        except Exception as e:
+            logger.warning("⚠️ Typing %s failed: %s", digits, e)
+            return False
+        if success:
+            logger.debug("⌨️ Typed %s", digits)
+        return success
+    
+    def _click_resolved(self, name: str, node_id: str, center_x: int, center_y: int) -> Dict[str, Any]:
+        """Click one pre-resolved button in click_sequence; re-verifies the window once on failure"""
+        abs_x = self.window_pos['left'] + center_x
+        abs_y = self.window_pos['top'] + center_y
+        success = self.gui_api.click(abs_x, abs_y)
+        if not success:
+            # Re-verify the window and retry once at the refreshed position
+            logger.warning("⚠️ Click on %s failed, re-checking Calculator window...", name)
+            self.invalidate_window_pos()
+            self._last_verify = 0.0
+            window_id = self._find_calculator_window()
+            if window_id:
+                self.window_id = window_id
+                self.gui_api.focus_window(self.window_id)
+                self._update_window_position()
+                if self.window_pos:
+                    abs_x = self.window_pos['left'] + center_x
+                    abs_y = self.window_pos['top'] + center_y
+                    success = self.gui_api.click(abs_x, abs_y)
+        
+        if success:
+            logger.debug("✅ Clicked %s (%s) at (%s, %s)", name, node_id, abs_x, abs_y)
+            self._last_verify = time.monotonic()
+            return {"success": True, "message": f"Clicked {name}", "node_id": node_id}
+        return {"success": False, "error": f"Failed to click {name}"}
+    
+    def compile_sequence(self, buttons: List[str], delay: float = 0.3) -> Callable[[], List[bool]]:
+        """Resolve a button sequence to screen coordinates once and return a function that clicks it
+        
+        The returned function skips per-click lookup and window validation; it returns one
+        success flag per button. Raises RuntimeError/ValueError if the sequence can't be resolved.
+        """
+        if not self.window_id:
+            result = self.open_calculator()
+            if not result.get("success"):
+                raise RuntimeError(result.get("error", "Could not open calculator"))
+        
+        self._update_window_position()
+        if not self.window_pos:
+            raise RuntimeError("Could not get window position")
+        
+        rows = []
+        for name in buttons:
+            node_id = self._find_node_by_name(name)
+            if not node_id:
+                raise ValueError(f"Button '{name}' not found in fdom.json")
+            row = self._id_to_idx.get(node_id)
+            if row is None:
+                raise ValueError(f"Invalid bbox for {node_id}")
+            rows.append(row)
+        # Offset every center by the window position in one array op
+        offset = np.array((self.window_pos['left'], self.window_pos['top']))
+        targets = tuple(map(tuple, (self._centers_arr[rows].reshape(-1, 2) + offset).tolist()))
+        
+        gui_api = self.gui_api
+        window_id = self.window_id
+        focus = self._simple_focus_window
+        
+        def run() -> List[bool]:
+            focus(window_id)
+            results = []
+            for x, y in targets:
+                results.append(gui_api.click(x, y))
+                time.sleep(delay)
+            return results
+        
+        return run
+    
+    def compile_codes(self, codes: np.ndarray, delay: float = 0.3) -> Callable[[], List[bool]]:
+        """compile_sequence for an int8 opcode row (e.g. from parse_batch); padding is ignored"""
+        return self.compile_sequence(decode(codes[codes != PAD_CODE]), delay)
+
+
+DEFAULT_SOCKET_PATH = "/tmp/mcp_calc.sock"
+# Bytes requested from stdin per read in stdio mode
+STDIN_CHUNK_SIZE = 64 * 1024
+
+# Static tools/list result; handle_request returns a shallow copy since responses get id/jsonrpc added
+_TOOLS_LIST_RESPONSE = {
+    "tools": [
+        {
+            "name": "open_calculator",
+            "description": "Opens Windows Calculator application",
+            "inputSchema": {
+                "type": "object",
+                "properties": {}
+            }
+        },
+        {
+            "name": "execute_calculation",
+            "description": "Executes a natural language calculation instruction (e.g., 'Add 2 and 3 and then find the square of the result')",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "instruction": {
+                        "type": "string",
+                        "description": "Natural language instruction for the calculation"
+                    }
+                },
+                "required": ["instruction"]
+            }
+        },
+        {
+            "name": "click_button",
+            "description": "Clicks a specific calculator button",
+            "inputSchema": {
+                "type": "object",
+                "properties": {
+                    "button": {
+                        "type": "string",
+                        "description": "Button name (e.g., '2', '+', '=', 'square')"
+                    }
+                },
+                "required": ["button"]
+            }
+        }
+    ]
+}
+# Pre-serialized tools/list result, spliced into single tools/list replies without re-encoding
+_TOOLS_LIST_JSON = _dumps_wire(_TOOLS_LIST_RESPONSE)
 
 
 # MCP Server Implementation
@@ -515,159 +866,227 @@ class CalculatorMCPServer:
     """MCP Server for Calculator Control"""
     
     def __init__(self):
-        self.calculator = CalculatorController()
+        # MCP_KEYBOARD=1 types digit runs instead of clicking each digit
+        self.calculator = CalculatorController(keyboard_fast_path=os.environ.get("MCP_KEYBOARD") == "1")
         self.parser = CalculatorInstructionParser()
+        # tools/call dispatch: tool name -> handler returning the result dict
+        self._tools: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            "open_calculator": self._tool_open,
+            "execute_calculation": self._tool_exec,
+            "click_button": self._tool_click,
+        }
+        # Serializes requests from concurrent socket clients (one Calculator window)
+        self._lock = threading.Lock()
+    
+    def serve_unix(self, path: str = DEFAULT_SOCKET_PATH):
+        """Serve JSON-RPC over a Unix domain socket; replies are Content-Length framed"""
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("Unix domain sockets are not supported on this platform")
+        
+        # Only clear a stale socket left by a previous run; never delete anything else at path
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"--unix path {path!r} exists and is not a socket")
+            os.unlink(path)
+        
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            listener.bind(path)
+            listener.listen()
+            print(f"🔌 Listening on {path}", file=sys.stderr)
+            while True:
+                conn, _ = listener.accept()
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+    
+    def _serve_connection(self, conn: socket.socket):
+        """Answer newline-delimited requests from one socket client until it disconnects"""
+        with conn, conn.makefile("rb") as reader:
+            for line in reader:
+                with self._lock:
+                    response = _process_line(self, line)
+                if response is not None:
+                    conn.sendall(_frame(response))
     
     def handle_request(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """Handle MCP request"""
         if method == "tools/list":
-            return {
-                "tools": [
-                    {
-                        "name": "open_calculator",
-                        "description": "Opens Windows Calculator application",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {}
-                        }
-                    },
-                    {
-                        "name": "execute_calculation",
-                        "description": "Executes a natural language calculation instruction (e.g., 'Add 2 and 3 and then find the square of the result')",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "instruction": {
-                                    "type": "string",
-                                    "description": "Natural language instruction for the calculation"
-                                }
-                            },
-                            "required": ["instruction"]
-                        }
-                    },
-                    {
-                        "name": "click_button",
-                        "description": "Clicks a specific calculator button",
-                        "inputSchema": {
-                            "type": "object",
-                            "properties": {
-                                "button": {
-                                    "type": "string",
-                                    "description": "Button name (e.g., '2', '+', '=', 'square')"
-                                }
-                            },
-                            "required": ["button"]
-                        }
-                    }
-                ]
-            }
+            return dict(_TOOLS_LIST_RESPONSE)
         
-        elif method == "tools/call":
-            tool_name = params.get("name")
-            arguments = params.get("arguments", {})
-            
-            if tool_name == "open_calculator":
-                result = self.calculator.open_calculator()
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": json.dumps(result, indent=2)
-                    }]
-                }
-            
-            elif tool_name == "execute_calculation":
-                instruction = arguments.get("instruction", "")
-                if not instruction:
-                    return {
-                        "content": [{
-                            "type": "text",
-                            "text": json.dumps({"success": False, "error": "No instruction provided"}, indent=2)
-                        }]
-                    }
-                
-                # Parse instruction
-                buttons = self.parser.parse(instruction)
-                
-                # Open calculator if not open
-                open_result = self.calculator.open_calculator()
-                if not open_result.get("success"):
-                    return {
-                        "content": [{
-                            "type": "text",
-                            "text": json.dumps(open_result, indent=2)
-                        }]
-                    }
-                
-                # Execute button sequence
-                results = []
-                for button in buttons:
-                    result = self.calculator.click_button(button)
-                    results.append({"button": button, "result": result})
-                    time.sleep(0.3)  # Small delay between clicks
-                
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": json.dumps({
-                            "success": True,
-                            "instruction": instruction,
-                            "button_sequence": buttons,
-                            "results": results
-                        }, indent=2)
-                    }]
-                }
-            
-            elif tool_name == "click_button":
-                button = arguments.get("button", "")
-                if not button:
-                    return {
-                        "content": [{
-                            "type": "text",
-                            "text": json.dumps({"success": False, "error": "No button provided"}, indent=2)
-                        }]
-                    }
-                
-                result = self.calculator.click_button(button)
-                return {
-                    "content": [{
-                        "type": "text",
-                        "text": json.dumps(result, indent=2)
-                    }]
-                }
+        if method == "tools/call":
+            tool = self._tools.get(params.get("name"))
+            if tool is not None:
+                return _text_content(tool(params.get("arguments", _EMPTY_DICT)))
         
         return {"error": {"code": -32601, "message": "Method not found"}}
+    
+    def _tool_open(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """open_calculator tool"""
+        return self.calculator.open_calculator()
+    
+    def _tool_exec(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """execute_calculation tool"""
+        instruction = arguments.get("instruction", "")
+        if not instruction:
+            return {"success": False, "error": "No instruction provided"}
+        
+        # Parse instruction
+        buttons = self.parser.parse(instruction)
+        
+        # Open calculator if not open
+        open_result = self.calculator.open_calculator()
+        if not open_result.get("success"):
+            return open_result
+        
+        # Execute button sequence with a single focus
+        click_results = self.calculator.click_sequence(buttons)
+        results = [{"button": button, "result": result} for button, result in zip(buttons, click_results)]
+        
+        return {
+            "success": True,
+            "instruction": instruction,
+            "button_sequence": buttons,
+            "results": results
+        }
+    
+    def _tool_click(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """click_button tool"""
+        button = arguments.get("button", "")
+        if not button:
+            return {"success": False, "error": "No button provided"}
+        
+        return self.calculator.click_button(button)
+
+
+def _text_content(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap a tool result as MCP text content"""
+    return {
+        "content": [{
+            "type": "text",
+            "text": _dumps(result)
+        }]
+    }
+
+def _frame(message: Any) -> bytes:
+    """Encode a JSON-RPC message (or already-encoded bytes) with a Content-Length header"""
+    body = message if isinstance(message, bytes) else _dumps_wire(message)
+    return b"Content-Length: %d\r\n\r\n" % len(body) + body
+
+
+def _encode_message(message: Any, framed: bool = False) -> bytes:
+    """Encode a JSON-RPC message for stdout: Content-Length framed or newline terminated"""
+    if framed:
+        return _frame(message)
+    body = message if isinstance(message, bytes) else _dumps_wire(message)
+    return body + b"\n"
+
+
+def _write_message(message: Any, framed: bool = False):
+    """Write a JSON-RPC message to binary stdout, optionally Content-Length framed"""
+    _write_encoded(_encode_message(message, framed))
+
+
+def _write_encoded(data: bytes):
+    """Write already-encoded messages to binary stdout with a single write and flush"""
+    # Flush pending text output first so it can't interleave with the messages
+    sys.stdout.flush()
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+
+def _handle_message(server: CalculatorMCPServer, request: Any) -> Dict[str, Any]:
+    """Handle one decoded JSON-RPC request object and build its response"""
+    try:
+        method = request.get("method", "")
+        params = request.get("params", {})
+        
+        response = server.handle_request(method, params)
+        response["id"] = request.get("id")
+        response["jsonrpc"] = "2.0"
+        return response
+        
+    except Exception as e:
+        return {
+            "jsonrpc": "2.0",
+            "id": request.get("id") if isinstance(request, dict) else None,
+            "error": {"code": -32603, "message": str(e)}
+        }
+
+
+def _process_line(server: CalculatorMCPServer, line) -> Optional[Any]:
+    """Handle one newline-delimited request or JSON-RPC batch array
+    
+    Returns the response (a list for batches, answered in request order, or pre-encoded
+    bytes for tools/list) or None for a blank line.
+    """
+    if not line.strip():
+        return None
+    try:
+        request = _loads(line)
+    except ValueError:
+        # Reply so the client fails fast instead of waiting for an answer that never comes
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+    
+    if isinstance(request, list):
+        if not request:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}
+        return [_handle_message(server, r) for r in request]
+    if isinstance(request, dict) and request.get("method") == "tools/list":
+        # Splice id/jsonrpc into the pre-serialized result instead of re-encoding the schema
+        return _TOOLS_LIST_JSON[:-1] + b',"id":' + _dumps_wire(request.get("id")) + b',"jsonrpc":"2.0"}'
+    return _handle_message(server, request)
 
 
 def main():
-    """Run MCP server (stdio mode)"""
+    """Run MCP server (stdio mode, or Unix socket mode with --unix [path])"""
     import sys
     
+    # Controller logs go to stderr so they never interleave with JSON-RPC on stdout
+    logging.basicConfig(stream=sys.stderr, level=os.environ.get("MCP_LOG", "WARNING").upper())
+    
+    args = sys.argv[1:]
     server = CalculatorMCPServer()
     
-    # Read from stdin, write to stdout
-    for line in sys.stdin:
-        try:
-            request = json.loads(line.strip())
-            method = request.get("method", "")
-            params = request.get("params", {})
-            
-            response = server.handle_request(method, params)
-            response["id"] = request.get("id")
-            response["jsonrpc"] = "2.0"
-            
-            print(json.dumps(response))
-            sys.stdout.flush()
-            
-        except json.JSONDecodeError:
+    if "--unix" in args:
+        idx = args.index("--unix") + 1
+        path = args[idx] if idx < len(args) and not args[idx].startswith("--") else DEFAULT_SOCKET_PATH
+        server.serve_unix(path)
+        return
+    
+    # --content-length: frame responses with a Content-Length header instead of newlines
+    framed = "--content-length" in args
+    
+    # Read stdin in large chunks and answer every complete line in a chunk with one
+    # write and one flush; _loads accepts bytes, so lines are never decoded to str
+    stdin_fd = sys.stdin.fileno()
+    pending = bytearray()
+    while True:
+        chunk = os.read(stdin_fd, STDIN_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        end = pending.rfind(b"\n")
+        if end < 0:
             continue
-        except Exception as e:
-            error_response = {
-                "jsonrpc": "2.0",
-                "id": request.get("id") if 'request' in locals() else None,
-                "error": {"code": -32603, "message": str(e)}
-            }
-            print(json.dumps(error_response))
-            sys.stdout.flush()
+        
+        # Keep the trailing partial line for the next read
+        lines = pending[:end].split(b"\n")
+        del pending[:end + 1]
+        
+        out = []
+        for line in lines:
+            response = _process_line(server, line)
+            if response is not None:
+                out.append(_encode_message(response, framed))
+        if out:
+            _write_encoded(b"".join(out))
+    
+    # Last request if stdin closed without a trailing newline
+    response = _process_line(server, pending)
+    if response is not None:
+        _write_message(response, framed)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+"""
+Opcode kernel for calculator button sequences
+Encodes buttons as int8 opcodes so the "=" safety fixup runs as a compiled loop
+"""
+from typing import List
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional - fall back to the plain Python kernel
+    njit = None
+
+
+# Opcode table: index == opcode
+INV_TOK = ("+", "-", "×", "÷", "=", "square", "√",
+           "0", "1", "2", "3", "4", "5", "6", "7", "8", "9")
+TOK = {button: code for code, button in enumerate(INV_TOK)}
+
+PAD_CODE = -1  # Row padding in batched opcode matrices
+DIV_CODE = TOK["÷"]  # Opcodes 0..DIV_CODE are binary operators
+EQ_CODE = TOK["="]
+SQUARE_CODE = TOK["square"]
+SQRT_CODE = TOK["√"]
+
+
+def _fixup(codes):
+    """Insert "=" before the first square/root if an operator precedes it"""
+    square_idx = -1
+    has_op = False
+    for i in range(codes.shape[0]):
+        code = codes[i]
+        if code == SQUARE_CODE or code == SQRT_CODE:
+            square_idx = i
+            break
+        if code <= DIV_CODE:
+            has_op = True
+
+    if square_idx > 0 and has_op and codes[square_idx - 1] != EQ_CODE:
+        out = np.empty(codes.shape[0] + 1, dtype=np.int8)
+        out[:square_idx] = codes[:square_idx]
+        out[square_idx] = EQ_CODE
+        out[square_idx + 1:] = codes[square_idx:]
+        return out
+    return codes.copy()
+
+
+# Explicit kernel signature: contiguous int8 opcode array in and out
+FIXUP_SIGNATURE = "int8[::1](int8[::1])"
+
+# cache=True persists the compiled kernel under __pycache__ across processes
+fixup = njit(cache=True)(_fixup) if njit is not None else _fixup
+
+
+def warm_up():
+    """Compile (or load from the on-disk cache) the fixup kernel for FIXUP_SIGNATURE"""
+    if njit is not None:
+        fixup.compile(FIXUP_SIGNATURE)
+
+
+def encode(buttons: List[str]) -> np.ndarray:
+    """Encode a button sequence as an int8 opcode array"""
+    return np.fromiter((TOK[b] for b in buttons), dtype=np.int8, count=len(buttons))
+
+
+def decode(codes: np.ndarray) -> List[str]:
+    """Decode an int8 opcode array back into button names"""
+    return [INV_TOK[c] for c in codes.tolist()]
+
+
+def encode_batch(sequences: List[List[str]]) -> np.ndarray:
+    """Encode several button sequences as an (N, max_len) int8 matrix padded with PAD_CODE"""
+    width = max((len(seq) for seq in sequences), default=0)
+    codes = np.full((len(sequences), width), PAD_CODE, dtype=np.int8)
+    for row, seq in enumerate(sequences):
+        codes[row, :len(seq)] = encode(seq)
+    return codes
+
+
+def fixup_batch(codes: np.ndarray) -> np.ndarray:
+    """Vectorized fixup over a padded opcode matrix; adds a column if any row gains an "="
+
+    Row-wise equivalent of fixup(): inserts "=" before the first square/root when an
+    operator precedes it and the previous button isn't already "=".
+    """
+    n, width = codes.shape
+    if n == 0 or width == 0:
+        return codes.copy()
+
+    rows = np.arange(n)
+    sqr_mask = (codes == SQUARE_CODE) | (codes == SQRT_CODE)
+    sqr_idx = np.argmax(sqr_mask, axis=1)
+    prev_idx = np.maximum(sqr_idx - 1, 0)
+    ops_seen = np.cumsum((codes >= 0) & (codes <= DIV_CODE), axis=1)
+    needs_eq = (sqr_mask.any(axis=1) & (sqr_idx > 0)
+                & (ops_seen[rows, prev_idx] > 0)
+                & (codes[rows, prev_idx] != EQ_CODE))
+    if not needs_eq.any():
+        return codes.copy()
+
+    # Shift everything from the square/root onwards one column right in rows that need it
+    cols = np.arange(width + 1)
+    src = np.where(needs_eq[:, None] & (cols >= sqr_idx[:, None]), cols - 1, cols)
+    padded = np.concatenate([codes, np.full((n, 1), PAD_CODE, dtype=np.int8)], axis=1)
+    out = padded[rows[:, None], src]
+    out[rows[needs_eq], sqr_idx[needs_eq]] = EQ_CODE
+    return out
+
+
+if __name__ == "__main__":
+    # Run once after install to populate the Numba cache
+    warm_up()
@@ -1,7 +1,7 @@
 """
 Test the parser to verify it adds = correctly
 """
-from mcp_calculator_server import CalculatorInstructionParser
+from calculator_parser import CalculatorInstructionParser
 
 parser = CalculatorInstructionParser()
 
@@ -7,13 +7,15 @@ import os
 import json
 import asyncio
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from PIL import Image
 from datetime import datetime
-from .helpers import debug_print
+from .helpers import debug_print, prepare_upload_image, print_traceback_once
+from .rate_limiter import AsyncRateLimiter
 
 try:
     from google import genai
+    from google.genai import types as genai_types
     from google.genai.errors import ServerError, ClientError
     GEMINI_AVAILABLE = True
 except ImportError:
@@ -38,6 +40,9 @@ class GeminiIconAnalyzer:
                  output_dir: str = "outputs", 
                  max_concurrent_requests: int = 4,
                  save_results: bool = True,
+                 requests_per_minute: Optional[float] = None,
+                 upload_max_side: Optional[int] = 1568,
+                 upload_format: str = "auto",
                  model: str = "gemini-2.0-flash-lite"):
         self.output_dir = output_dir
         self.model = model
@@ -54,6 +59,11 @@ class GeminiIconAnalyzer:
         
         self.max_concurrent_requests = max_concurrent_requests
         self.save_results = save_results
+        # Shared by all concurrent requests; None disables client-side rate limiting
+        self.rate_limiter = AsyncRateLimiter(requests_per_minute) if requests_per_minute else None
+        # Images are downscaled/re-encoded before upload (see prepare_upload_image)
+        self.upload_max_side = upload_max_side
+        self.upload_format = upload_format
         
         if not GEMINI_AVAILABLE:
             raise ImportError("google-genai package not installed. Install with: pip install google-genai")
@@ -89,7 +99,8 @@ class GeminiIconAnalyzer:
     
     async def analyze_grouped_images(self, grouped_image_paths: List[str] = None, 
                                    filename_base: str = None,
-                                   direct_images: List[Tuple] = None) -> Dict[str, Any]:
+                                   direct_images: List[Tuple] = None,
+                                   on_image_result: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
         """
         Analyze grouped images generated by Seraphine
         
@@ -97,6 +108,7 @@ class GeminiIconAnalyzer:
             grouped_image_paths: List of paths to final_*.png images (traditional method)
             filename_base: Base filename for saving results
             direct_images: List of (PIL.Image, filename) tuples (optimized method)
+            on_image_result: Optional callback invoked with each image result as soon as it completes
             
         Returns:
             Dictionary containing analysis results
@@ -205,21 +217,29 @@ class GeminiIconAnalyzer:
                         'error': str(e)
                     }
         
+        async def analyze_indexed(image_data, filename: str, index: int):
+            """Tag each result with its index so completion order doesn't lose input order"""
+            try:
+                return index, await analyze_and_process_image_direct(image_data, filename, index)
+            except Exception as e:
+                return index, e
+        
         # Create tasks for all images
-        tasks = []
-        for i, (image_data, filename) in enumerate(valid_images):
-            tasks.append(analyze_and_process_image_direct(image_data, filename, i))
+        tasks = [
+            analyze_indexed(img, name, i) 
+            for i, (img, name) in enumerate(valid_images)
+        ]
         
         debug_print(f"🚀 Executing {len(tasks)} requests to Gemini (max {self.max_concurrent_requests} concurrent)...")
-        image_results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        # Handle any exceptions from gather
-        processed_results = []
+        # Handle each image as soon as it completes, keeping results in input order
+        processed_results = [None] * len(valid_images)
         total_icons_found = 0
         
-        for i, result in enumerate(image_results):
+        for next_done in asyncio.as_completed(tasks):
+            i, result = await next_done
             if isinstance(result, Exception):
-                error_result = {
+                result = {
                     'image_path': f"direct:{valid_images[i][1]}" if direct_images else valid_images[i][0],
                     'image_name': valid_images[i][1],
                     'icons_found': 0,
@@ -228,12 +248,12 @@ class GeminiIconAnalyzer:
                     'analysis_success': False,
                     'error': f'Task exception: {str(result)}'
                 }
-                processed_results.append(error_result)
-                debug_print(f"    ❌ Task exception for {valid_images[i][1]}: {result}")
-            else:
-                processed_results.append(result)
-                if result['analysis_success']:
-                    total_icons_found += result['icons_found']
+                debug_print(f"    ❌ Task exception for {valid_images[i][1]}: {result['error']}")
+            elif result['analysis_success']:
+                total_icons_found += result['icons_found']
+            processed_results[i] = result
+            if on_image_result is not None:
+                on_image_result(result)
         
         image_results = processed_results
         
@@ -285,6 +305,10 @@ class GeminiIconAnalyzer:
         print(f"🤖 [GEMINI] {prompt_preview}")
         print(f"🤖 [GEMINI] Full prompt length: {len(self.prompt)} characters")
         
+        # Encode once (downscaled, compressed) and reuse the bytes for every retry
+        image_bytes, image_mime = prepare_upload_image(image, self.upload_max_side, self.upload_format)
+        image_part = genai_types.Part.from_bytes(data=image_bytes, mime_type=image_mime)
+        
         # Retry logic for rate limiting (429 errors)
         for attempt in range(max_retries):
             try:
@@ -296,9 +320,12 @@ class GeminiIconAnalyzer:
                 else:
                     print(f"🤖 [GEMINI] Sending request to Gemini API...")
                 
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                
                 response = await self.client.aio.models.generate_content(
                     model=self.model,
-                    contents=[self.prompt, image],
+                    contents=[self.prompt, image_part],
                 )
                 
                 response_text = response.text
@@ -370,9 +397,7 @@ class GeminiIconAnalyzer:
                 else:
                     # Other errors - don't retry
                     print(f"🤖 [GEMINI] ❌ Analysis error: {e}")
-                    import traceback
-                    print(f"🤖 [GEMINI] Full error traceback:")
-                    traceback.print_exc()
+                    print_traceback_once(e, prefix="🤖 [GEMINI] ")
                     debug_print(f"    ❌ Analysis error: {e}")
                     return None
         
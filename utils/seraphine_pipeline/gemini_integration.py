@@ -2,7 +2,39 @@
 Gemini Integration Utility
 Handles integration of Gemini LLM results into seraphine structure
 """
-from .helpers import debug_print
+import os
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import Optional
+
+from .helpers import UPLOAD_FORMATS, debug_print, print_traceback_once
+from .llm_cache import LLMResponseCache
+from .pipeline_exporter import create_enhanced_seraphine_structure
+from .seraphine_generator import FinalGroupImageGenerator
+
+# Analyzers are optional: each one needs its provider SDK
+try:
+    from .groq_analyzer import GroqIconAnalyzer
+except ImportError:
+    GroqIconAnalyzer = None
+
+try:
+    from .gemini_analyzer import GeminiIconAnalyzer
+except ImportError:
+    GeminiIconAnalyzer = None
+
+# One direct-image generator per output_dir, reused across screenshots
+_generator_cache = {}
+
+def _get_generator(output_dir):
+    """Return the cached FinalGroupImageGenerator for output_dir, creating it on first use"""
+    generator = _generator_cache.get(output_dir)
+    if generator is None:
+        generator = _generator_cache[output_dir] = FinalGroupImageGenerator(
+            output_dir=output_dir,
+            save_mapping=False  # Don't save files, just get images
+        )
+    return generator
 
 def integrate_llm_results(seraphine_analysis, llm_results, llm_provider="gemini"):
     """
@@ -39,12 +71,13 @@ def integrate_llm_results(seraphine_analysis, llm_results, llm_provider="gemini"
             for icon in image_result['icons']:
                 icon_id = icon.get('id')  # Like "H1_1", "H12_3", etc.
                 if icon_id:
+                    # Keyed by the bbox attribute names so each match is a single __dict__ update
                     id_to_llm[icon_id] = {
-                        'icon_name': icon.get('name', 'unknown'),
-                        'brief': icon.get('usage', 'No description'),
-                        'enabled': icon.get('enabled', True),
-                        'interactive': icon.get('interactive', True),
-                        'type': icon.get('type', 'icon')  # New field
+                        'g_icon_name': icon.get('name', 'unknown'),
+                        'g_brief': icon.get('usage', 'No description'),
+                        'g_enabled': icon.get('enabled', True),
+                        'g_interactive': icon.get('interactive', True),
+                        'g_type': icon.get('type', 'icon')  # New field
                     }
                     # Show first few mappings
                     if len(id_to_llm) <= 5:
@@ -57,29 +90,34 @@ def integrate_llm_results(seraphine_analysis, llm_results, llm_provider="gemini"
     bbox_processor = seraphine_analysis['bbox_processor']
     total_integrated = 0
     
-    for group_id, boxes in bbox_processor.final_groups.items():
-        # Process each box in the group
-        for i, bbox in enumerate(boxes):
-            item_id = f"{group_id}_{i+1}"  # H1_1, H1_2, etc.
-            
-            if item_id in id_to_llm:
-                # Found exact match!
-                llm_data = id_to_llm[item_id]
-                bbox.g_icon_name = llm_data['icon_name']
-                bbox.g_brief = llm_data['brief']
-                bbox.g_enabled = llm_data['enabled']
-                bbox.g_interactive = llm_data['interactive']
-                bbox.g_type = llm_data['type']  # New field
-                total_integrated += 1
-                
-                if total_integrated <= 5:  # Show first 5 for debugging
-                    debug_print(f"   ✅ {item_id}: '{llm_data['icon_name']}' - {llm_data['brief'][:50]}...")
-            else:
-                # Default values if no LLM result available
-                bbox.g_icon_name = 'unanalyzed'
-                bbox.g_brief = f'Not analyzed by {provider_name} LLM'
+    # Index every bbox by its seraphine ID once (H1_1, H1_2, etc.)
+    bbox_by_id = {
+        f"{group_id}_{i+1}": bbox
+        for group_id, boxes in bbox_processor.final_groups.items()
+        for i, bbox in enumerate(boxes)
+    }
+    total_elements = len(bbox_by_id)
+    
+    # Walk the (usually smaller) LLM mapping and look each ID up directly
+    for item_id, llm_data in id_to_llm.items():
+        bbox = bbox_by_id.get(item_id)
+        if bbox is None:
+            continue
+        
+        # Found exact match! Set g_icon_name, g_brief, g_enabled, g_interactive and g_type
+        vars(bbox).update(llm_data)
+        total_integrated += 1
+        
+        if total_integrated <= 5:  # Show first 5 for debugging
+            debug_print(f"   ✅ {item_id}: '{llm_data['g_icon_name']}' - {llm_data['g_brief'][:50]}...")
+    
+    # Default values if no LLM result available
+    if total_integrated < total_elements:
+        unanalyzed = {'g_icon_name': 'unanalyzed', 'g_brief': f'Not analyzed by {provider_name} LLM'}
+        for item_id, bbox in bbox_by_id.items():
+            if item_id not in id_to_llm:
+                vars(bbox).update(unanalyzed)
     
-    total_elements = sum(len(boxes) for boxes in bbox_processor.final_groups.values())
     print(f"{provider_emoji} ✅ Integrated: {total_integrated}/{total_elements} elements updated with {provider_name} names")
     if total_integrated < total_elements:
         print(f"{provider_emoji} ⚠️  {total_elements - total_integrated} elements did NOT get {provider_name} names (will show 'unanalyzed')")
@@ -89,8 +127,6 @@ def integrate_llm_results(seraphine_analysis, llm_results, llm_provider="gemini"
     
     # 🎯 REGENERATE SERAPHINE_LLM_GROUPS WITH UPDATED DATA
     # Keep using 'seraphine_gemini_groups' key for backward compatibility
-    from .pipeline_exporter import create_enhanced_seraphine_structure
-    
     # Get the merged_detections from analysis for proper ID lookup
     merged_detections = seraphine_analysis.get('original_merged_detections', [])
     
@@ -116,21 +152,79 @@ def integrate_gemini_results(seraphine_analysis, gemini_results):
     """Backward compatibility wrapper - redirects to integrate_llm_results"""
     return integrate_llm_results(seraphine_analysis, gemini_results)
 
+@dataclass(frozen=True)
+class LLMConfig:
+    """LLM settings resolved once from config.json for the selected provider"""
+    provider: Optional[str]  # "groq", "gemini", or None when no provider is enabled
+    api_key: Optional[str]
+    prompt_path: Optional[str]
+    max_concurrent: int
+    save_json: bool
+    return_b64: bool
+    model: str
+    output_dir: str
+    requests_per_minute: Optional[float]
+    upload_max_side: int
+    upload_format: str
+    cache_enabled: bool
+    cache_ttl_seconds: Optional[float]
+    
+    @classmethod
+    def from_dict(cls, config):
+        """Select the provider (Groq first), read its API key and fill in defaults"""
+        if config.get("groq_enabled", True):
+            provider = "groq"
+            api_key = os.getenv("GROQ_API_KEY")
+            prompt_path = config.get("groq_prompt_path") or config.get("gemini_prompt_path")  # Use same prompt
+            max_concurrent = config.get("groq_max_concurrent", 4)
+            save_json = config.get("save_groq_json", True)
+            return_b64 = config.get("groq_return_images_b64", True)
+            model = config.get("groq_model", "llama-3.3-70b-versatile")
+            requests_per_minute = config.get("groq_requests_per_minute")
+        elif config.get("gemini_enabled", False):
+            provider = "gemini"
+            api_key = os.getenv("GEMINI_API_KEY")
+            prompt_path = config.get("gemini_prompt_path")  # None uses the default prompt
+            max_concurrent = config.get("gemini_max_concurrent", 4)
+            save_json = config.get("save_gemini_json", True)
+            return_b64 = config.get("gemini_return_images_b64", True)
+            model = config.get("gemini_model", "gemini-2.0-flash-lite")
+            requests_per_minute = config.get("gemini_requests_per_minute")
+        else:
+            provider = api_key = prompt_path = model = requests_per_minute = None
+            max_concurrent, save_json, return_b64 = 4, True, True
+        
+        # Checked here so a typo fails once with a clear message instead of failing every image upload
+        upload_format = config.get("llm_upload_format", "auto")
+        if not isinstance(upload_format, str) or upload_format.lower() not in UPLOAD_FORMATS:
+            raise ValueError(
+                f"config.json 'llm_upload_format' must be one of {', '.join(UPLOAD_FORMATS)} (got {upload_format!r})"
+            )
+        
+        return cls(
+            provider=provider,
+            api_key=api_key,
+            prompt_path=prompt_path,
+            max_concurrent=max_concurrent,
+            save_json=save_json,
+            return_b64=return_b64,
+            model=model,
+            output_dir=config.get("output_dir", "outputs"),
+            requests_per_minute=requests_per_minute,
+            upload_max_side=config.get("llm_upload_max_side", 1568),
+            upload_format=upload_format,
+            cache_enabled=config.get("llm_cache_enabled", True),
+            cache_ttl_seconds=config.get("llm_cache_ttl_seconds", 7 * 24 * 3600)
+        )
+
 async def run_llm_analysis(seraphine_analysis, grouped_image_paths, image_path, config):
     """
     Run LLM analysis with optimized image sharing - supports both Gemini and Groq
     """
-    # Determine which LLM to use - prioritize Groq
-    llm_provider = config.get("llm_provider", "groq").lower()  # Default to Groq
-    groq_enabled = config.get("groq_enabled", True)  # Default to Groq enabled
-    gemini_enabled = config.get("gemini_enabled", False)
-    
-    # Auto-detect: if Groq is enabled, use it; otherwise try Gemini
-    if groq_enabled:
-        llm_provider = "groq"
-    elif gemini_enabled:
-        llm_provider = "gemini"
-    else:
+    # Resolve provider, API key and defaults once - Groq is preferred when enabled
+    llm_config = LLMConfig.from_dict(config)
+    llm_provider = llm_config.provider
+    if llm_provider is None:
         print("❌ [LLM] No LLM provider enabled!")
         print("   Set 'groq_enabled': true or 'gemini_enabled': true in config.json")
         return None
@@ -146,9 +240,8 @@ async def run_llm_analysis(seraphine_analysis, grouped_image_paths, image_path,
     print(f"📸 Analyzing screenshot: {image_path}")
     
     # Check for API key - PRIORITIZE GROQ
-    import os
+    api_key = llm_config.api_key
     if llm_provider == "groq":
-        api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             print("🚀 [GROQ] ❌ ERROR: GROQ_API_KEY environment variable is NOT set!")
             print("🚀 [GROQ]    Set it with: $env:GROQ_API_KEY = 'your-key' (PowerShell)")
@@ -158,7 +251,6 @@ async def run_llm_analysis(seraphine_analysis, grouped_image_paths, image_path,
             print(f"🚀 [GROQ] ✅ GROQ_API_KEY found (length: {len(api_key)} chars)")
             print(f"🚀 [GROQ] 🎯 Using Groq for all icon/button caption and description generation")
     else:
-        api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             print("🤖 [GEMINI] ❌ ERROR: GEMINI_API_KEY environment variable is NOT set!")
             print("🤖 [GEMINI]    Set it with: $env:GEMINI_API_KEY = 'your-key' (PowerShell)")
@@ -171,44 +263,45 @@ async def run_llm_analysis(seraphine_analysis, grouped_image_paths, image_path,
     debug_print("=" * 70)
     
     try:
-        import os
-        
-        output_dir = config.get("output_dir", "outputs")
-        filename_base = os.path.splitext(os.path.basename(image_path))[0]
+        output_dir = llm_config.output_dir
+        # Computed once and shared by the generator and the analyzer
+        filename_base = PurePath(image_path).stem
         
         # Initialize analyzer based on provider
         if llm_provider == "groq":
-            from .groq_analyzer import GroqIconAnalyzer
-            analyzer = GroqIconAnalyzer(
-                prompt_path=config.get("groq_prompt_path") or config.get("gemini_prompt_path"),  # Use same prompt
-                output_dir=output_dir,
-                max_concurrent_requests=config.get("groq_max_concurrent", 4),
-                save_results=config.get("save_groq_json", True),
-                model=config.get("groq_model", "llama-3.3-70b-versatile")
-            )
+            if GroqIconAnalyzer is None:
+                raise ImportError("groq_analyzer could not be imported")
+            analyzer_class = GroqIconAnalyzer
         else:
-            from .gemini_analyzer import GeminiIconAnalyzer
-            analyzer = GeminiIconAnalyzer(
-                prompt_path=config.get("gemini_prompt_path"),  # Pass None to use default
-                output_dir=output_dir,
-                max_concurrent_requests=config.get("gemini_max_concurrent", 4),
-                save_results=config.get("save_gemini_json", True),
-                model=config.get("gemini_model", "gemini-2.0-flash-lite")
-            )
+            if GeminiIconAnalyzer is None:
+                raise ImportError("gemini_analyzer could not be imported")
+            analyzer_class = GeminiIconAnalyzer
+        
+        # With the LLM cache on, every per-image result is already persisted in .llm_cache/,
+        # so the analyzer's own analysis JSON would be a second copy of the same responses
+        save_results = llm_config.save_json and not llm_config.cache_enabled
+        if llm_config.save_json and not save_results:
+            print(f"{'🚀 [GROQ]' if llm_provider == 'groq' else '🤖 [GEMINI]'} 💾 save_{llm_provider}_json ignored: "
+                  f"llm_cache_enabled is on, per-image results are saved in {os.path.join(output_dir, '.llm_cache')}")
+        analyzer = analyzer_class(
+            prompt_path=llm_config.prompt_path,
+            output_dir=output_dir,
+            max_concurrent_requests=llm_config.max_concurrent,
+            save_results=save_results,
+            requests_per_minute=llm_config.requests_per_minute,
+            upload_max_side=llm_config.upload_max_side,
+            upload_format=llm_config.upload_format,
+            model=llm_config.model
+        )
         
         # Use direct image mode for optimized sharing
-        use_direct_images = config.get("groq_return_images_b64", True) if llm_provider == "groq" else config.get("gemini_return_images_b64", True)
+        use_direct_images = llm_config.return_b64
         
         if use_direct_images:
             debug_print("   📸 Using optimized direct image mode (faster, less I/O)")
             
-            from .seraphine_generator import FinalGroupImageGenerator
-            
-            # Create generator to get direct images
-            final_group_generator = FinalGroupImageGenerator(
-                output_dir=output_dir,
-                save_mapping=False  # Don't save files, just get images
-            )
+            # Generator for direct images (created once per output_dir)
+            final_group_generator = _get_generator(output_dir)
             
             # Get direct images using the correct method
             result = final_group_generator.create_grouped_images(
@@ -233,13 +326,56 @@ async def run_llm_analysis(seraphine_analysis, grouped_image_paths, image_path,
             print(f"{provider_emoji} 📋 Each image contains UI elements with labeled IDs (H1_1, H2_3, etc.)")
             debug_print(f"   🖼️  Generated {len(direct_images)} direct images for {llm_provider} analysis")
             
-            # Analyze with direct images (no file I/O)
-            print(f"{provider_emoji} 🚀 Starting {llm_provider.upper()} API calls for {len(direct_images)} images...")
-            llm_results = await analyzer.analyze_grouped_images(
-                grouped_image_paths=None,
-                filename_base=filename_base,
-                direct_images=direct_images
-            )
+            # Replay results for images analyzed before with the same model and prompt;
+            # only the misses are sent to the API
+            llm_cache = None
+            cached_results = {}
+            cache_keys = {}
+            pending_images = direct_images
+            if llm_config.cache_enabled:
+                llm_cache = LLMResponseCache(
+                    output_dir=output_dir,
+                    model=analyzer.model,
+                    prompt=analyzer.prompt,
+                    ttl_seconds=llm_config.cache_ttl_seconds
+                )
+                pending_images = []
+                for img, name in direct_images:
+                    if "combined" in name:  # Only combined images are analyzed
+                        cache_keys[name] = llm_cache.key(img)
+                        cached = llm_cache.get(cache_keys[name])
+                        if cached is not None:
+                            cached_results[name] = cached
+                            continue
+                    pending_images.append((img, name))
+            
+            def on_image_result(image_result):
+                # Cache each image as soon as it finishes, so completed work survives a failed run
+                name = image_result['image_name']
+                if name in cache_keys:
+                    llm_cache.put(cache_keys[name], image_result)
+                debug_print(f"   📥 {name}: {image_result['icons_found']} icons")
+            
+            if any("combined" in name for _, name in pending_images) or not cached_results:
+                # Analyze with direct images (no file I/O)
+                print(f"{provider_emoji} 🚀 Starting {llm_provider.upper()} API calls for {len(pending_images)} images...")
+                llm_results = await analyzer.analyze_grouped_images(
+                    grouped_image_paths=None,
+                    filename_base=filename_base,
+                    direct_images=pending_images,
+                    on_image_result=on_image_result
+                )
+            else:
+                print(f"{provider_emoji} 💾 All {len(cached_results)} images served from the LLM cache - skipping API calls")
+                llm_results = {
+                    'filename_base': filename_base,
+                    'analysis_duration_seconds': 0,
+                    'analysis_mode': 'direct',
+                    'images': []
+                }
+            
+            if llm_cache is not None:
+                llm_results = _merge_cached_results(llm_results, cached_results, direct_images, llm_cache)
         else:
             debug_print("   📁 Using file mode (traditional)")
             # Use traditional file mode
@@ -257,6 +393,8 @@ async def run_llm_analysis(seraphine_analysis, grouped_image_paths, image_path,
         print(f"{provider_emoji} ✅ Successfully analyzed: {llm_results['successful_analyses']}/{llm_results['total_images_analyzed']} images")
         print(f"{provider_emoji} 🎯 Total icons/buttons identified: {llm_results['total_icons_found']}")
         print(f"{provider_emoji} ⏱️  Total analysis time: {llm_results['analysis_duration_seconds']:.2f}s")
+        if 'cache_stats' in llm_results:
+            print(f"{provider_emoji} 💾 LLM cache: {llm_results['cache_stats']['hits']} hits, {llm_results['cache_stats']['misses']} misses")
         print("="*80 + "\n")
         
         debug_print(f"✅ {llm_provider} analysis complete:")
@@ -277,13 +415,33 @@ async def run_llm_analysis(seraphine_analysis, grouped_image_paths, image_path,
     except Exception as e:
         provider_emoji = "🚀 [GROQ]" if llm_provider == "groq" else "🤖 [GEMINI]"
         print(f"{provider_emoji} ❌ ERROR: {llm_provider} analysis failed: {str(e)}")
-        import traceback
-        print(f"{provider_emoji} Full error traceback:")
-        traceback.print_exc()
+        print_traceback_once(e, prefix=f"{provider_emoji} ")
         debug_print(f"❌ {llm_provider} analysis failed: {str(e)}")
         return None
 
 
+def _merge_cached_results(llm_results, cached_results, direct_images, llm_cache):
+    """
+    Merge cached per-image results back in with the fresh ones
+    
+    Images keep their direct_images order and the summary counts cover both sources.
+    """
+    by_name = {image_result['image_name']: image_result for image_result in llm_results.get('images', [])}
+    by_name.update(cached_results)
+    
+    images = [by_name[name] for _, name in direct_images if name in by_name]
+    successful = [r for r in images if r['analysis_success']]
+    
+    llm_results['images'] = images
+    llm_results['total_images_analyzed'] = len(images)
+    llm_results['successful_analyses'] = len(successful)
+    llm_results['total_icons_found'] = sum(r['icons_found'] for r in successful)
+    if 'analysis_success' in llm_results:
+        llm_results['analysis_success'] = bool(successful)
+    llm_results['cache_stats'] = dict(llm_cache.stats)
+    return llm_results
+
+
 # Keep backward compatibility
 async def run_gemini_analysis(seraphine_analysis, grouped_image_paths, image_path, config):
     """Backward compatibility wrapper - redirects to run_llm_analysis"""
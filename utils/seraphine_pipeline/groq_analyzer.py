@@ -7,12 +7,12 @@ import os
 import json
 import asyncio
 import base64
-import io
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from PIL import Image
 from datetime import datetime
-from .helpers import debug_print
+from .helpers import debug_print, prepare_upload_image, print_traceback_once
+from .rate_limiter import AsyncRateLimiter
 
 try:
     from groq import Groq
@@ -38,6 +38,9 @@ class GroqIconAnalyzer:
                  output_dir: str = "outputs", 
                  max_concurrent_requests: int = 4,
                  save_results: bool = True,
+                 requests_per_minute: Optional[float] = None,
+                 upload_max_side: Optional[int] = 1568,
+                 upload_format: str = "auto",
                  model: str = "llama-3.3-70b-versatile"):
         self.output_dir = output_dir
         self.model = model
@@ -53,6 +56,11 @@ class GroqIconAnalyzer:
         
         self.max_concurrent_requests = max_concurrent_requests
         self.save_results = save_results
+        # Shared by all concurrent requests; None disables client-side rate limiting
+        self.rate_limiter = AsyncRateLimiter(requests_per_minute) if requests_per_minute else None
+        # Images are downscaled/re-encoded before upload (see prepare_upload_image)
+        self.upload_max_side = upload_max_side
+        self.upload_format = upload_format
         
         if not GROQ_AVAILABLE:
             raise ImportError("groq package not installed. Install with: pip install groq")
@@ -87,16 +95,16 @@ class GroqIconAnalyzer:
             print(f"🚀 [GROQ] ❌ ERROR: Prompt file not found: {self.prompt_path}")
             raise FileNotFoundError(f"Prompt file not found: {self.prompt_path}")
     
-    def _image_to_base64(self, image: Image.Image) -> str:
-        """Convert PIL Image to base64 string for Groq API"""
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode()
-        return img_str
+    def _image_to_base64(self, image: Image.Image) -> Tuple[str, str]:
+        """Convert PIL Image to a base64 string for Groq API; returns (base64, mime_type)"""
+        image_bytes, mime_type = prepare_upload_image(image, self.upload_max_side, self.upload_format)
+        img_str = base64.b64encode(image_bytes).decode()
+        return img_str, mime_type
     
     async def analyze_grouped_images(self, grouped_image_paths: List[str] = None, 
                                    filename_base: str = None,
-                                   direct_images: List[Tuple] = None) -> Dict[str, Any]:
+                                   direct_images: List[Tuple] = None,
+                                   on_image_result: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
         """
         Analyze grouped images generated by Seraphine
         
@@ -104,6 +112,7 @@ class GroqIconAnalyzer:
             grouped_image_paths: List of paths to final_*.png images (traditional method)
             filename_base: Base filename for saving results
             direct_images: List of (PIL.Image, filename) tuples (optimized method)
+            on_image_result: Optional callback invoked with each image result as soon as it completes
             
         Returns:
             Dictionary containing analysis results
@@ -211,36 +220,41 @@ class GroqIconAnalyzer:
                         'error': str(e)
                     }
         
+        async def analyze_indexed(image_data, filename: str, index: int):
+            """Tag each result with its index so completion order doesn't lose input order"""
+            try:
+                return index, await analyze_and_process_image_direct(image_data, filename, index)
+            except Exception as e:
+                return index, e
+        
         # Create tasks for all images
         tasks = [
-            analyze_and_process_image_direct(img, name, i) 
+            analyze_indexed(img, name, i) 
             for i, (img, name) in enumerate(valid_images)
         ]
         
-        # Execute all tasks
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Process results
-        processed_results = []
+        # Handle each image as soon as it completes, keeping results in input order
+        processed_results = [None] * len(valid_images)
         total_icons_found = 0
         
-        for i, result in enumerate(results):
+        for next_done in asyncio.as_completed(tasks):
+            i, result = await next_done
             if isinstance(result, Exception):
-                error_result = {
-                    'image_path': valid_images[i][1] if i < len(valid_images) else 'unknown',
-                    'image_name': valid_images[i][1] if i < len(valid_images) else 'unknown',
+                result = {
+                    'image_path': valid_images[i][1],
+                    'image_name': valid_images[i][1],
                     'icons_found': 0,
                     'icons': [],
                     'raw_response': None,
                     'analysis_success': False,
                     'error': f'Task exception: {str(result)}'
                 }
-                processed_results.append(error_result)
-                debug_print(f"    ❌ Task exception for {valid_images[i][1]}: {result}")
-            else:
-                processed_results.append(result)
-                if result['analysis_success']:
-                    total_icons_found += result['icons_found']
+                debug_print(f"    ❌ Task exception for {valid_images[i][1]}: {result['error']}")
+            elif result['analysis_success']:
+                total_icons_found += result['icons_found']
+            processed_results[i] = result
+            if on_image_result is not None:
+                on_image_result(result)
         
         image_results = processed_results
         
@@ -293,7 +307,7 @@ class GroqIconAnalyzer:
         print(f"🚀 [GROQ] Full prompt length: {len(self.prompt)} characters")
         
         # Convert image to base64 for Groq API
-        image_base64 = self._image_to_base64(image)
+        image_base64, image_mime = self._image_to_base64(image)
         
         # Retry logic for rate limiting (429 errors)
         for attempt in range(max_retries):
@@ -306,8 +320,13 @@ class GroqIconAnalyzer:
                 else:
                     print(f"🚀 [GROQ] Sending request to Groq API...")
                 
-                # Groq API call with image
-                response = self.client.chat.completions.create(
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                
+                # Groq API call with image; the client is synchronous, so run it in a worker
+                # thread to let the other semaphore-bounded requests proceed concurrently
+                response = await asyncio.to_thread(
+                    self.client.chat.completions.create,
                     model=self.model,
                     messages=[
                         {
@@ -317,7 +336,7 @@ class GroqIconAnalyzer:
                                 {
                                     "type": "image_url",
                                     "image_url": {
-                                        "url": f"data:image/png;base64,{image_base64}"
+                                        "url": f"data:{image_mime};base64,{image_base64}"
                                     }
                                 }
                             ]
@@ -357,9 +376,7 @@ class GroqIconAnalyzer:
                 else:
                     # Other errors - don't retry
                     print(f"🚀 [GROQ] ❌ Analysis error: {e}")
-                    import traceback
-                    print(f"🚀 [GROQ] Full error traceback:")
-                    traceback.print_exc()
+                    print_traceback_once(e, prefix="🚀 [GROQ] ")
                     debug_print(f"    ❌ Analysis error: {e}")
                     return None
         
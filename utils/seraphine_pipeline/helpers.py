@@ -1,10 +1,25 @@
+import io
 import os
 import json
+import time
+import traceback
 from functools import wraps
+from PIL import Image
+
+CONFIG_PATH = "utils/seraphine_pipeline/config.json"
+
+# (config.json mtime, debug mode) from the last time the file was actually read
+_debug_mode_state = [None, False]
+
+# Values accepted for prepare_upload_image's image_format (config.json "llm_upload_format")
+UPLOAD_FORMATS = ("png", "jpeg", "jpg", "auto")
+
+# (exception type, message) -> time its traceback was last printed
+_traceback_last_printed = {}
 
 def load_configuration():
     """Load and validate configuration from config.json"""
-    config_path = "utils/seraphine_pipeline/config.json"
+    config_path = CONFIG_PATH
     
     if not os.path.exists(config_path):
         print(f"Error: Configuration file '{config_path}' not found!")
@@ -18,14 +33,72 @@ def load_configuration():
         print(f"Error loading configuration: {e}")
         return None
 
+def is_debug_mode():
+    """True when config.json has "mode": "debug"; the file is only re-read after it changes"""
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime != _debug_mode_state[0]:
+        config = load_configuration() if mtime is not None else None
+        _debug_mode_state[:] = [mtime, bool(config and config.get("mode", "").lower() == "debug")]
+    return _debug_mode_state[1]
+
 def debug_only(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
-        config = load_configuration()
-        if config and config.get("mode", "").lower() == "debug":
+        # A stat per call instead of reading and parsing config.json every time
+        if is_debug_mode():
             return func(*args, **kwargs)
     return wrapper
 
 @debug_only
 def debug_print(*args, **kwargs):
-    print(*args, **kwargs)
\ No newline at end of file
+    print(*args, **kwargs)
+
+def print_traceback_once(exc, prefix="", window_seconds=60):
+    """
+    Print exc's full traceback unless the same error (type and message) was printed in the last window_seconds
+    
+    A systemic failure such as a bad API key fails every image the same way; only the first
+    traceback is formatted and the repeats get a one-line note.
+    """
+    key = (type(exc), str(exc))
+    now = time.monotonic()
+    last = _traceback_last_printed.get(key)
+    if last is not None and now - last < window_seconds:
+        print(f"{prefix}(repeated {type(exc).__name__} - traceback shown above)")
+        return
+    # Forget errors whose window has passed so distinct messages don't accumulate forever
+    for stale in [k for k, t in _traceback_last_printed.items() if now - t >= window_seconds]:
+        del _traceback_last_printed[stale]
+    _traceback_last_printed[key] = now
+    print(f"{prefix}Full error traceback:")
+    traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+def prepare_upload_image(image, max_side=1568, image_format="auto", quality=85):
+    """
+    Encode a PIL image for an LLM upload, downscaling it so the longest side is at most max_side
+    
+    image_format is "png", "jpeg" or "auto" (whichever of the two is smaller - flat UI crops
+    often compress better as PNG, busy ones as JPEG). max_side=None keeps the original size.
+    Returns (image_bytes, mime_type).
+    """
+    width, height = image.size
+    if max_side and max(width, height) > max_side:
+        scale = max_side / max(width, height)
+        image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+    
+    image_format = image_format.lower()
+    if image_format not in UPLOAD_FORMATS:
+        raise ValueError(f"unsupported upload format {image_format!r}")
+    encoded = []
+    if image_format in ("png", "auto"):
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG")
+        encoded.append((buffered.getvalue(), "image/png"))
+    if image_format in ("jpeg", "jpg", "auto"):
+        buffered = io.BytesIO()
+        image.convert("RGB").save(buffered, format="JPEG", quality=quality, optimize=True)
+        encoded.append((buffered.getvalue(), "image/jpeg"))
+    return min(encoded, key=lambda item: len(item[0]))
\ No newline at end of file
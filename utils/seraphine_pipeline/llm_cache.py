@@ -0,0 +1,65 @@
+"""
+LLM Response Cache
+Replays Groq/Gemini per-image analysis results from disk when model, prompt and image are unchanged
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from .helpers import debug_print
+
+
+class LLMResponseCache:
+    """
+    Exact-match on-disk cache for per-image LLM analysis results
+    Entries live in {output_dir}/.llm_cache/{sha256}.json and expire after ttl_seconds
+    """
+    
+    def __init__(self, output_dir: str = "outputs", model: str = "", prompt: str = "",
+                 ttl_seconds: Optional[float] = 7 * 24 * 3600):
+        self.cache_dir = os.path.join(output_dir, ".llm_cache")
+        self.ttl_seconds = ttl_seconds
+        self.stats = {'hits': 0, 'misses': 0}
+        # Model and prompt are the same for every image, so hash them once
+        self._base = hashlib.sha256(f"{model}\0{prompt}\0".encode("utf-8"))
+    
+    def key(self, image) -> str:
+        """Cache key for a PIL image: SHA256(model | prompt | size | mode | raw pixels)"""
+        h = self._base.copy()
+        h.update(f"{image.size[0]}x{image.size[1]}:{image.mode}\0".encode("ascii"))
+        h.update(image.tobytes())
+        return h.hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached image result for key, or None on a miss or expired entry"""
+        path = self._path(key)
+        try:
+            if self.ttl_seconds is not None and time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                self.stats['misses'] += 1
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return result
+    
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a successful image result under key (written atomically)"""
+        if not result.get('analysis_success'):
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            debug_print(f"⚠️  Could not write LLM cache entry {path}: {e}")
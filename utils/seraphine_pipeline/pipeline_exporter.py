@@ -19,6 +19,12 @@ def create_enhanced_seraphine_structure(seraphine_analysis: Dict, merged_detecti
     
     seraphine_structure = {}
     
+    # Index detections by merged_id once instead of scanning the list for every bbox;
+    # setdefault keeps the first detection per ID, as the old linear search did
+    detection_by_merged_id = {}
+    for detection in merged_detections:
+        detection_by_merged_id.setdefault(detection.get('merged_id'), detection)
+    
     for group_id, bboxes in bbox_processor.final_groups.items():
         # Get group-level information (including explore flag)
         group_info = group_details.get(group_id, {})
@@ -31,11 +37,7 @@ def create_enhanced_seraphine_structure(seraphine_analysis: Dict, merged_detecti
             element_id = f"{group_id}_{i+1}"
             
             # Find matching detection for proper ID mapping
-            matching_detection = None
-            for detection in merged_detections:
-                if detection.get('merged_id') == bbox.merged_id:
-                    matching_detection = detection
-                    break
+            matching_detection = detection_by_merged_id.get(bbox.merged_id)
             
             element_data = {
                 'bbox': [bbox.x1, bbox.y1, bbox.x2, bbox.y2],
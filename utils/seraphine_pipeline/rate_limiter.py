@@ -0,0 +1,35 @@
+"""
+Async Rate Limiter
+Token bucket shared by an analyzer's concurrent LLM API calls to stay under provider rate limits
+"""
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket refilled at rate_per_minute / 60 tokens per second
+    Holds at most `capacity` tokens (defaults to one minute's worth) so short bursts still go out at once
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, tokens: float = 1):
+        """Wait until `tokens` are available, then take them"""
+        # A request larger than the bucket could never be satisfied; cap it at a full bucket
+        tokens = min(tokens, self.capacity)
+        # Holding the lock while sleeping keeps waiters in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
@@ -2,11 +2,37 @@
 Visualize FDOM nodes on screenshot with bounding boxes and labels
 Helps identify which node ID corresponds to which UI element
 """
+import functools
 import json
 import os
 from PIL import Image, ImageDraw, ImageFont
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional - fall back to the stdlib json module
+    orjson = None
+
+# Scratch surface for measuring labels; text extents don't depend on the target image
+_MEASURE_DRAW = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+@functools.lru_cache(maxsize=1)
+def _load_fonts():
+    """Load the label fonts once per process, falling back to PIL's default font"""
+    try:
+        return ImageFont.truetype("arial.ttf", 12), ImageFont.truetype("arial.ttf", 14)
+    except:
+        try:
+            return ImageFont.truetype("C:/Windows/Fonts/arial.ttf", 12), ImageFont.truetype("C:/Windows/Fonts/arial.ttf", 14)
+        except:
+            return ImageFont.load_default(), ImageFont.load_default()
+
+@functools.lru_cache(maxsize=4096)
+def _label_extent(label, font):
+    """Text bbox of label drawn at (0, 0); labels repeat a lot, so each is measured once"""
+    return _MEASURE_DRAW.textbbox((0, 0), label, font=font)
+
 def visualize_fdom_nodes(fdom_path: str, output_path: str = None):
     """
     Create a visualization of all nodes from fdom.json on the screenshot
@@ -16,8 +42,12 @@ def visualize_fdom_nodes(fdom_path: str, output_path: str = None):
         output_path: Optional output path for the visualization
     """
     # Load fdom.json
-    with open(fdom_path, 'r', encoding='utf-8') as f:
-        fdom_data = json.load(f)
+    if orjson is not None:
+        with open(fdom_path, 'rb') as f:
+            fdom_data = orjson.loads(f.read())
+    else:
+        with open(fdom_path, 'r', encoding='utf-8') as f:
+            fdom_data = json.load(f)
     
     # Get root state
     root_state = fdom_data.get('states', {}).get('root', {})
@@ -29,20 +59,10 @@ def visualize_fdom_nodes(fdom_path: str, output_path: str = None):
         return
     
     # Load screenshot
-    img = Image.open(screenshot_path)
-    draw = ImageDraw.Draw(img)
+    img = Image.open(screenshot_path).convert('RGBA')
     
     # Try to load a font, fallback to default if not available
-    try:
-        font = ImageFont.truetype("arial.ttf", 12)
-        font_bold = ImageFont.truetype("arial.ttf", 14)
-    except:
-        try:
-            font = ImageFont.truetype("C:/Windows/Fonts/arial.ttf", 12)
-            font_bold = ImageFont.truetype("C:/Windows/Fonts/arial.ttf", 14)
-        except:
-            font = ImageFont.load_default()
-            font_bold = ImageFont.load_default()
+    font, font_bold = _load_fonts()
     
     # Colors for different node types
     colors = {
@@ -53,44 +73,43 @@ def visualize_fdom_nodes(fdom_path: str, output_path: str = None):
     
     print(f"Visualizing {len(nodes)} nodes on screenshot...")
     
-    # Draw each node
+    # Flatten nodes with a usable bbox into (x1, y1, x2, y2, color, label) tuples up front;
+    # malformed bboxes are dropped here so the drawing loops just unpack
+    rects = []
     for node_id, node_data in nodes.items():
-        bbox = node_data.get('bbox', [])
+        bbox = node_data.get('bbox', ())
         if len(bbox) != 4:
             continue
-        
-        x1, y1, x2, y2 = bbox
-        node_type = node_data.get('type', 'unknown')
-        color = colors.get(node_type, colors['unknown'])
-        
-        # Draw bounding box
-        draw.rectangle([x1, y1, x2, y2], outline=color, width=2)
-        
-        # Draw semi-transparent fill
-        overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
-        overlay_draw.rectangle([x1, y1, x2, y2], fill=(*color, 30))
-        img = Image.alpha_composite(img.convert('RGBA'), overlay).convert('RGB')
-        draw = ImageDraw.Draw(img)
+        color = colors.get(node_data.get('type', 'unknown'), colors['unknown'])
         
         # Prepare label text
-        label_parts = [node_id]
         icon_name = node_data.get('g_icon_name', '')
-        if icon_name and icon_name != 'Unknown':
-            label_parts.append(icon_name)
-        
-        label = '\n'.join(label_parts)
+        label = f"{node_id}\n{icon_name}" if icon_name and icon_name != 'Unknown' else node_id
+        rects.append((*bbox, color, label))
+    
+    # Draw every semi-transparent fill into one overlay and composite it once
+    overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
+    overlay_draw = ImageDraw.Draw(overlay)
+    for x1, y1, x2, y2, color, _ in rects:
+        overlay_draw.rectangle([x1, y1, x2, y2], fill=(*color, 30))
+    img = Image.alpha_composite(img, overlay)
+    draw = ImageDraw.Draw(img)
+    
+    # Draw outlines and labels on top of the fills
+    for x1, y1, x2, y2, color, label in rects:
+        # Draw bounding box
+        draw.rectangle([x1, y1, x2, y2], outline=color, width=2)
         
         # Calculate label position (top-left of bbox)
         label_x = x1 + 2
         label_y = y1 - 25 if y1 > 25 else y1 + 2
         
-        # Get text size for background
-        bbox_text = draw.textbbox((label_x, label_y), label, font=font)
+        # Get text size for background (cached extent, shifted to the label position)
+        tx0, ty0, tx1, ty1 = _label_extent(label, font)
         
         # Draw label background
         draw.rectangle(
-            [bbox_text[0]-2, bbox_text[1]-2, bbox_text[2]+2, bbox_text[3]+2],
+            [label_x+tx0-2, label_y+ty0-2, label_x+tx1+2, label_y+ty1+2],
             fill='white',
             outline=color,
             width=1
@@ -105,7 +124,7 @@ def visualize_fdom_nodes(fdom_path: str, output_path: str = None):
         output_path = os.path.join(screenshot_dir, 'fdom_nodes_visualization.png')
     
     # Save visualization
-    img.save(output_path)
+    img.convert('RGB').save(output_path)
     print(f"Visualization saved to: {output_path}")
     print(f"Open this image to see which node IDs correspond to which UI elements")
     